@@ -0,0 +1,73 @@
+import argparse
+import os
+
+from .file_index import FileIndex
+from .helper import ORGANIZATION_VARIABLES, config_directory
+from .loader import Loader
+
+
+class Artifact(object):
+    """Stands in for an uploaded artifact, only the artifact file itself matters for dependencies"""
+
+    def __init__(self, key="", bucket=""):
+        self.key = key
+        self.bucket = bucket
+
+
+def template_dependencies(config_file):
+    """Files, listed directories and listed trees of the stack of a config file, None if it can't be rendered"""
+    from .cli import load_config_files
+
+    config_file = os.path.realpath(config_file)
+    with config_directory(config_file):
+        try:
+            args = argparse.Namespace()
+            with open(config_file) as f:
+                load_config_files(args, [f])
+            config = vars(args)
+            if any(config.get(variable) for variable in ORGANIZATION_VARIABLES):
+                return None
+            variables = dict(config.get("vars") or {})
+            artifacts = config.get("artifacts") or []
+            if artifacts:
+                variables["artifacts"] = {artifact: Artifact() for artifact in artifacts}
+            loader = Loader(variables=variables, index=FileIndex(config.get("files_ignore")))
+            loader.load()
+            files = {config_file}
+            # Real paths so files shared between stacks through symlinks match the changed paths
+            files.update(os.path.realpath(file) for file in loader.dependencies)
+            files.update(os.path.realpath(artifact) for artifact in artifacts)
+            directories = {os.path.realpath(d) for d in loader.directories}
+            return files, directories, {os.path.realpath(tree) for tree in loader.trees}
+        except (SystemExit, OSError):
+            return None
+
+
+def is_affected(dependencies, changed_paths):
+    if dependencies is None:
+        # Stacks that can't be analyzed are always affected
+        return True
+    files, directories, trees = dependencies
+    for path in changed_paths:
+        # Files added to or removed from a listed directory can change template files, modules or files()
+        if path in files or os.path.dirname(path) in directories:
+            return True
+        if any(path.startswith(os.path.join(tree, "")) for tree in trees):
+            return True
+    return False
+
+
+def affected_config_files(config_files, changed_paths):
+    changed_paths = {os.path.realpath(path) for path in changed_paths}
+    return [
+        config_file for config_file in config_files if is_affected(template_dependencies(config_file), changed_paths)
+    ]
+
+
+def stack_name(config_file):
+    from .cli import load_config_files
+
+    args = argparse.Namespace()
+    with open(config_file) as f:
+        load_config_files(args, [f])
+    return vars(args).get("stack") or config_file
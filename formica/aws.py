@@ -1,14 +1,203 @@
+import threading
+import time
+
 import boto3
 import botocore
 from botocore import credentials
+from botocore.config import Config
 import os
 
+from . import cache, rate_limit
+
+# Clients and resources of the current session by service and region, shared by all of formica
+_clients = {}
+_lock = threading.Lock()
+config = None
+# Seconds caller identities are cached on disk between runs, 0 disables the disk cache
+identity_cache_ttl = 0
+# Seconds organization accounts and regions are cached on disk between runs, 0 disables the disk cache
+organization_cache_ttl = 0
+refresh_organization_cache = False
+# Where the regions of the account come from, "api" calls EC2 and "endpoints" reads the endpoint data of botocore
+region_source = "api"
+partition = None
+opted_in_regions = False
+_identities = {}
+_lookups = {}
+# Profile, region and AWS environment the default session was set up with, and the options of its clients
+_session_key = None
+_client_options = None
+_configured_at = 0
+# Retry mode set through formica's arguments, CloudFormation clients retry adaptively without one
+retry_mode_set = None
+
+
+def initialize(region, profile, **options):
+    global _session_key
+    # A long running formica serve keeps the session with its clients and lookups while the same one is requested
+    session_key = (region, profile, tuple(sorted((k, v) for k, v in os.environ.items() if k.startswith("AWS_"))))
+    if session_key != _session_key or boto3.DEFAULT_SESSION is None:
+        cli_cache = os.path.join(os.path.expanduser("~"), ".aws/cli/cache")
+
+        session = botocore.session.Session(profile=profile)
+        session.get_component("credential_provider").get_provider("assume-role").cache = credentials.JSONFileCache(
+            cli_cache
+        )
+        boto3.setup_default_session(botocore_session=session, region_name=region, profile_name=profile)
+        _session_key = session_key
+        reset()
+    configure(**options)
+
+
+def configure(
+    max_pool_connections=None,
+    retry_mode=None,
+    identity_ttl=None,
+    organization_ttl=None,
+    refresh_organization=False,
+    regions_from=None,
+    regions_partition=None,
+    only_opted_in_regions=False,
+    rate_limits=None,
+):
+    global config, identity_cache_ttl, organization_cache_ttl, refresh_organization_cache, retry_mode_set
+    global region_source, partition, opted_in_regions, _client_options, _configured_at
+    identity_cache_ttl = identity_ttl or 0
+    organization_cache_ttl = organization_ttl or 0
+    refresh_organization_cache = refresh_organization
+    region_source = regions_from or "api"
+    partition = regions_partition
+    opted_in_regions = only_opted_in_regions
+    retry_mode_set = retry_mode
+    rate_limit.configure(rate_limits)
+    _configured_at = time.time()
+    options = {}
+    if max_pool_connections:
+        options["max_pool_connections"] = max_pool_connections
+    if retry_mode:
+        options["retries"] = {"mode": retry_mode}
+    if options != _client_options:
+        config = Config(**options) if options else None
+        _client_options = options
+        reset()
+
+
+def reset():
+    with _lock:
+        _clients.clear()
+        _identities.clear()
+        _lookups.clear()
+
+
+def arguments(region=None, service=None):
+    kwargs = {}
+    if region:
+        kwargs["region_name"] = region
+    client_config = config
+    if service == "cloudformation" and not retry_mode_set:
+        # Backs the rate limit of formica, calls throttled anyway are retried at the rate CloudFormation accepts
+        client_config = (config or Config()).merge(Config(retries={"mode": "adaptive"}))
+    if client_config is not None:
+        kwargs["config"] = client_config
+    return kwargs
+
+
+def limit_calls(cloudformation):
+    """Send every call of the CloudFormation client through the rate limit of its account, region and API family"""
+    region = cloudformation.meta.region_name
+
+    def before_call(model, **kwargs):
+        if rate_limit.limited(model.name):
+            rate_limit.acquire(caller_identity()["Account"], region, model.name)
+
+    # Emitted to every handler once per call before the request is built, retries are left to the adaptive retries
+    cloudformation.meta.events.register("before-parameter-build.cloudformation", before_call)
+
+
+def client(service, region=None):
+    key = ("client", boto3.DEFAULT_SESSION, service, region)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = boto3.client(service, **arguments(region, service))
+            if service == "cloudformation":
+                limit_calls(_clients[key])
+        return _clients[key]
+
+
+def resource(service, region=None):
+    key = ("resource", boto3.DEFAULT_SESSION, service, region)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = boto3.resource(service, **arguments(region))
+        return _clients[key]
+
+
+def credentials_key(sts):
+    session = boto3.DEFAULT_SESSION
+    session_credentials = session.get_credentials() if session else None
+    if session_credentials is None:
+        return None
+    return cache.key(session_credentials.access_key, sts.meta.region_name)
+
+
+def _cached(namespace, disk_key, ttl, fetch, refresh=False):
+    if disk_key and not refresh:
+        cached = cache.load(namespace, disk_key)
+        if cached and time.time() - cached["time"] < ttl:
+            return cached["value"]
+    value = fetch()
+    if disk_key:
+        cache.store(namespace, disk_key, dict(time=time.time(), value=value))
+    return value
+
+
+def caller_identity():
+    """The STS caller identity of the current session, fetched once per process"""
+    sts = client("sts")
+    key = ("identity", boto3.DEFAULT_SESSION)
+    with _lock:
+        if key in _identities:
+            return _identities[key]
+
+    def fetch():
+        identity = sts.get_caller_identity()
+        return {name: identity[name] for name in ["Account", "Arn", "UserId"] if name in identity}
+
+    disk_key = credentials_key(sts) if identity_cache_ttl > 0 and cache.enabled() else None
+    identity = _cached("identities", disk_key, identity_cache_ttl, fetch)
+    with _lock:
+        _identities[key] = identity
+    return identity
+
+
+def organization_lookup(name, fetch):
+    """Result of an organization wide lookup, shared within the process and cached on disk per main account"""
+    key = (name, boto3.DEFAULT_SESSION)
+    with _lock:
+        cached = _lookups.get(key)
+    if cached:
+        fetched_at, value = cached
+        # A refresh only reuses what was fetched during the current run
+        refreshed = not refresh_organization_cache or fetched_at >= _configured_at
+        if refreshed and (organization_cache_ttl <= 0 or time.time() - fetched_at < organization_cache_ttl):
+            return value
+    disk_key = None
+    if organization_cache_ttl > 0 and cache.enabled():
+        disk_key = cache.key(name, caller_identity()["Account"], client("sts").meta.region_name)
+    fetched_at = time.time()
+    value = _cached("organizations", disk_key, organization_cache_ttl, fetch, refresh_organization_cache)
+    with _lock:
+        _lookups[key] = (fetched_at, value)
+    return value
 
-def initialize(region, profile):
-    cli_cache = os.path.join(os.path.expanduser("~"), ".aws/cli/cache")
 
-    session = botocore.session.Session(profile=profile)
-    session.get_component("credential_provider").get_provider("assume-role").cache = credentials.JSONFileCache(
-        cli_cache
-    )
-    boto3.setup_default_session(botocore_session=session, region_name=region, profile_name=profile)
+def endpoint_regions(partition_name=None):
+    """Regions known to the bundled endpoint data of botocore, available without calling AWS"""
+    session = boto3.DEFAULT_SESSION or boto3.session.Session()
+    if partition_name is None:
+        partition_name = "aws"
+        for available in session.get_available_partitions():
+            if session.region_name in session.get_available_regions("ec2", partition_name=available):
+                partition_name = available
+                break
+    return session.get_available_regions("ec2", partition_name=partition_name)
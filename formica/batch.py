@@ -0,0 +1,242 @@
+import fnmatch
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .output import prefixed, prefixed_output
+
+logger = logging.getLogger(__name__)
+
+# Commands that render the template of the stack before talking to AWS
+TEMPLATE_COMMANDS = ["change", "diff"]
+CONFIG_FILE_PATTERNS = ["*.config.yaml", "*.config.yml", "*.config.json"]
+DEFAULT_CONCURRENCY = 10
+SUMMARY_HEADERS = ["Stack", "Config File", "Status", "Duration"]
+
+SUCCEEDED = "Succeeded"
+FAILED = "Failed"
+SKIPPED = "Skipped"
+
+
+def config_files(paths):
+    """The given config files plus the config files in and below the given directories"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+                for filename in sorted(filenames):
+                    if any(fnmatch.fnmatch(filename, pattern) for pattern in CONFIG_FILE_PATTERNS):
+                        files.append(os.path.join(dirpath, filename))
+        else:
+            files.append(path)
+    return list(dict.fromkeys(os.path.normpath(f) for f in files))
+
+
+class BatchStack(object):
+    def __init__(self, config_file):
+        self.config_file = config_file
+        self.name = config_file
+        self.args = None
+        self.status = None
+        self.duration = 0
+        # Unknown until the template of the stack is rendered
+        self.exports = None
+        self.imports = set()
+
+    def fail(self, reason):
+        self.status = "{}: {}".format(FAILED, reason) if reason else FAILED
+
+    def skip(self, reason):
+        self.status = "{}: {}".format(SKIPPED, reason)
+
+    @property
+    def failed(self):
+        return self.status is not None and self.status != SUCCEEDED
+
+
+def exit_reason(code):
+    if code is None or code == 0:
+        return None
+    return code if isinstance(code, str) else "exit code {}".format(code)
+
+
+def current_session():
+    import boto3
+
+    return boto3.DEFAULT_SESSION
+
+
+def session_mismatch(args):
+    session = current_session()
+    if session is None:
+        return None
+    for option, current in [("region", session.region_name), ("profile", session.profile_name)]:
+        value = vars(args).get(option)
+        if value and value != current:
+            return "{} {} differs from the {} of the batch".format(option, value, option)
+    return None
+
+
+def load_arguments(command, config_file):
+    """Arguments of the command as if it ran with only the config file set"""
+    from .cli import create_parser, load_config_files
+
+    args = create_parser().parse_args([command, "--config-file", config_file])
+    for f in args.config_file:
+        with f:
+            load_config_files(args, [f])
+    return args
+
+
+def prepare(stack, command, ordered=False):
+    """Load the config file of the stack and render its template from the directory of the config file"""
+    from . import dependencies
+    from .cli import convert_role_name_to_arn, collect_vars
+    from .helper import config_directory
+    from .loader import Loader
+
+    config_file = os.path.abspath(stack.config_file)
+    with config_directory(config_file):
+        try:
+            args = load_arguments(command, config_file)
+            stack.name = args.stack or stack.name
+            if not args.stack:
+                stack.fail("no stack set in config file")
+                return
+            mismatch = session_mismatch(args)
+            if mismatch:
+                stack.fail(mismatch)
+                return
+            convert_role_name_to_arn(args)
+            render = command in TEMPLATE_COMMANDS and not vars(args).get("use_previous_template")
+            if render or ordered:
+                # Other commands don't take template variables, they are read the same way formica template does
+                template_args = args if command in TEMPLATE_COMMANDS else load_arguments("template", config_file)
+                loader = Loader(variables=collect_vars(template_args))
+                loader.load()
+                if render:
+                    args.loader = loader
+                if ordered:
+                    template = loader.template_dictionary()
+                    session = current_session()
+                    context = dependencies.Context(
+                        args.stack, session.region_name if session else None, vars(args).get("parameters"), template
+                    )
+                    stack.exports = dependencies.exports(template, context)
+                    stack.imports = dependencies.imports(template, context)
+            # Commands run from the original directory once the template is rendered
+            if vars(args).get("artifacts"):
+                args.artifacts = [os.path.abspath(artifact) for artifact in args.artifacts]
+            stack.args = args
+        except SystemExit as e:
+            stack.fail(exit_reason(e.code))
+        except Exception as e:
+            stack.fail(str(e))
+
+
+def run(stack):
+    start = time.time()
+    with prefixed(stack.name):
+        try:
+            stack.args.func(stack.args)
+            stack.status = SUCCEEDED
+        except SystemExit as e:
+            reason = exit_reason(e.code)
+            if reason:
+                stack.fail(reason)
+            else:
+                stack.status = SUCCEEDED
+        except Exception as e:
+            logger.info(e)
+            stack.fail(str(e))
+    stack.duration = time.time() - start
+
+
+def run_stacks(stacks, concurrency):
+    """Run the prepared stacks on a pool of threads, at most concurrency at the same time"""
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(run, stack) for stack in stacks]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        except BaseException:
+            # Stacks that didn't start yet are skipped, running ones finish their current operation
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def summary(stacks):
+    from texttable import Texttable
+
+    table = Texttable(max_width=150)
+    table.add_rows([SUMMARY_HEADERS])
+    for stack in stacks:
+        table.add_row([stack.name, stack.config_file, stack.status or "Skipped", "{:.0f}s".format(stack.duration)])
+    logger.info(table.draw() + "\n")
+
+
+def run_waves(stacks, command, concurrency):
+    """Run the stacks in waves so stacks only run once the stacks they import exports from succeeded
+
+    Removing stacks goes the other way, stacks are removed once no other stack imports their exports anymore.
+    """
+    from . import dependencies
+
+    by_config_file = {stack.config_file: stack for stack in stacks}
+    graph = dependencies.dependency_graph(
+        {stack.config_file: stack.exports or set() for stack in stacks},
+        {stack.config_file: stack.imports for stack in stacks},
+    )
+    # Imports no stack of the batch exports could come from a stack that failed before its exports were known
+    unprepared = sorted(stack.name for stack in stacks if stack.exports is None)
+    exported = set().union(*(stack.exports or set() for stack in stacks))
+    if command == "remove":
+        graph = {
+            config_file: {dependent for dependent, depends_on in graph.items() if config_file in depends_on}
+            for config_file in graph
+        }
+    waves, cyclic = dependencies.waves(graph)
+    for config_file in cyclic:
+        by_config_file[config_file].fail("dependency cycle")
+    for number, wave in enumerate(waves, 1):
+        runnable = []
+        for config_file in wave:
+            stack = by_config_file[config_file]
+            if stack.args is None:
+                continue
+            blocking = sorted(by_config_file[c].name for c in graph[config_file] if by_config_file[c].failed)
+            if blocking:
+                stack.skip("{} did not succeed".format(", ".join(blocking)))
+            elif command != "remove" and unprepared and stack.imports - exported:
+                # CloudFormation itself refuses to remove stacks whose exports are still imported
+                stack.skip("{} failed before its exports were known".format(", ".join(unprepared)))
+            else:
+                runnable.append(stack)
+        if runnable:
+            logger.info("Wave {}: {}".format(number, ", ".join(stack.name for stack in runnable)))
+            run_stacks(runnable, concurrency)
+
+
+def batch(command, paths, concurrency=None, ordered=False):
+    files = config_files(paths)
+    if not files:
+        logger.error("No config files found in {}".format(", ".join(paths)))
+        sys.exit(1)
+    stacks = [BatchStack(config_file) for config_file in files]
+    with prefixed_output():
+        for stack in stacks:
+            with prefixed(stack.name):
+                prepare(stack, command, ordered)
+        if ordered:
+            run_waves(stacks, command, concurrency or DEFAULT_CONCURRENCY)
+        else:
+            run_stacks([stack for stack in stacks if stack.args], concurrency or DEFAULT_CONCURRENCY)
+    summary(stacks)
+    failed = [stack for stack in stacks if stack.failed]
+    if failed:
+        logger.info("{} of {} stacks failed".format(len(failed), len(stacks)))
+        sys.exit(1)
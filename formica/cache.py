@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import pickle
+from stat import S_ISREG
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache/formica")
+# Size cap of the whole cache directory in Megabytes
+DEFAULT_MAX_SIZE = 100
+
+directory = None
+max_size = 0
+
+
+def initialize(cache_directory=None, cache_max_size=None):
+    global directory, max_size
+    directory = cache_directory or DEFAULT_DIRECTORY
+    if cache_max_size is None:
+        cache_max_size = DEFAULT_MAX_SIZE
+    max_size = cache_max_size * 1024 * 1024
+
+
+def enabled():
+    return bool(directory) and max_size > 0
+
+
+def path(*elements):
+    if not enabled():
+        return None
+    cache_path = os.path.join(directory, *elements)
+    os.makedirs(cache_path, exist_ok=True)
+    return cache_path
+
+
+def touch(file_name):
+    try:
+        os.utime(file_name)
+    except OSError:
+        pass
+
+
+def evict():
+    """Remove the least recently used entries until the cache fits its size, run once at the end of every run"""
+    if not enabled() or not os.path.isdir(directory):
+        return
+    entries = []
+    # Only entries of the namespaces are evicted, never other files kept in the cache directory
+    namespaces = [entry.path for entry in os.scandir(directory) if entry.is_dir(follow_symlinks=False)]
+    for namespace in namespaces:
+        for dirpath, _, filenames in os.walk(namespace):
+            for filename in filenames:
+                file_path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.lstat(file_path)
+                except OSError:
+                    continue
+                if S_ISREG(stat.st_mode):
+                    entries.append((stat.st_mtime, stat.st_size, file_path))
+    total = sum(size for _, size, _ in entries)
+    # Least recently used entries go first, cache hits refresh the mtime through touch
+    for _, size, file_path in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.remove(file_path)
+            total -= size
+        except OSError:
+            pass
+
+
+def key(*values):
+    try:
+        serialized = json.dumps(values, sort_keys=True)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def file_digest(file_name):
+    digest = hashlib.sha256()
+    try:
+        with open(file_name, "rb") as f:
+            for block in iter(lambda: f.read(65536), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def load(namespace, key):
+    cache_path = path(namespace)
+    if not cache_path:
+        return None
+    file_name = os.path.join(cache_path, key)
+    try:
+        with open(file_name, "rb") as f:
+            value = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    touch(file_name)
+    return value
+
+
+def store(namespace, key, value):
+    cache_path = path(namespace)
+    if not cache_path:
+        return
+    file_name = os.path.join(cache_path, key)
+    # Write to a temporary file first so concurrent runs never read a partially written entry
+    temporary = "{}.{}.tmp".format(file_name, os.getpid())
+    with open(temporary, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, file_name)
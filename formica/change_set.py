@@ -1,20 +1,98 @@
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import logging
 from formica.s3 import temporary_bucket
-from botocore.exceptions import ClientError, WaiterError
+from botocore.exceptions import ClientError
 from texttable import Texttable
-import boto3
 
-from formica import CHANGE_SET_FORMAT
+from formica import CHANGE_SET_FORMAT, aws
+from formica.polling import Poller
 import time
 
 CHANGE_SET_HEADER = ["Action", "LogicalId", "PhysicalId", "Type", "Replacement", "Changed"]
+CHANGE_SET_COLUMN_SIZE = [8, 30, 60, 30, 11, 30]
+# Seconds between polls of a change set being created and until giving up on it
+POLL_DELAY = 2
+MAX_POLL_DELAY = 10
+TIMEOUT = 1200
+CREATING_STATES = ["CREATE_PENDING", "CREATE_IN_PROGRESS"]
+# Replacement values of changes that replace or might replace the resource
+REPLACING = ["True", "Conditional"]
+# Nested change sets described at the same time, the number of connections botocore keeps per client by default
+NESTED_CHANGE_SET_CONCURRENCY = 10
 
 logger = logging.getLogger(__name__)
 
-cf = boto3.client("cloudformation")
+
+def nested_change_sets(changes):
+    """Logical ids and ARNs of the change sets of the nested stacks in the changes"""
+    return [
+        (change["ResourceChange"]["LogicalResourceId"], change["ResourceChange"]["ChangeSetId"])
+        for change in changes
+        if change["ResourceChange"]["ResourceType"] == "AWS::CloudFormation::Stack"
+        and change["ResourceChange"].get("ChangeSetId")
+    ]
+
+
+def print_metadata_table(change_set):
+    table = Texttable(max_width=150)
+    logger.info("Deployment metadata:")
+    parameters = ", ".join(
+        [
+            parameter["ParameterKey"] + "=" + parameter["ParameterValue"]
+            for parameter in change_set.get("Parameters", [])
+        ]
+    )
+    table.add_row(["Parameters", parameters])
+    tags = [tag["Key"] + "=" + tag["Value"] for tag in change_set.get("Tags", [])]
+    table.add_row(["Tags ", ", ".join(tags)])
+    table.add_row(["Capabilities ", ", ".join(change_set.get("Capabilities", []))])
+    logger.info(table.draw() + "\n")
+    logger.info("Resource Changes:")
+
+
+def create_changes_table():
+    table = Texttable()
+    table.set_cols_width(CHANGE_SET_COLUMN_SIZE)
+    return table
+
+
+def print_changes_header():
+    table = create_changes_table()
+    table.add_rows([CHANGE_SET_HEADER])
+    table.set_deco(Texttable.BORDER | Texttable.VLINES)
+    logger.info(table.draw())
+
+
+def print_changes(changes):
+    if not changes:
+        return
+
+    def __change_detail(change):
+        target_ = change["Target"]
+        attribute = target_["Attribute"]
+        if attribute == "Properties":
+            return target_.get("Name", "")
+        else:
+            return attribute
+
+    table = create_changes_table()
+    table.set_deco(0)
+    for change in changes:
+        resource_change = change["ResourceChange"]
+        table.add_row(
+            [
+                resource_change["Action"],
+                resource_change["LogicalResourceId"],
+                resource_change.get("PhysicalResourceId", ""),
+                resource_change["ResourceType"],
+                resource_change.get("Replacement", ""),
+                ", ".join(sorted(set([__change_detail(c) for c in resource_change["Details"]]))),
+            ]
+        )
+    logger.info(table.draw())
 
 
 class ChangeSet:
@@ -34,13 +112,13 @@ class ChangeSet:
         optional_arguments = {}
         parameters_set = []
         if use_previous_parameters:
-            stacks = cf.describe_stacks(StackName=self.stack)
+            stacks = self.client.describe_stacks(StackName=self.stack)
             parameters_set = [
                 {"ParameterKey": p["ParameterKey"], "UsePreviousValue": True}
                 for p in stacks["Stacks"][0]["Parameters"]
             ]
         if parameters:
-            for (key, value) in parameters.items():
+            for key, value in parameters.items():
                 item = next((x for x in parameters_set if x["ParameterKey"] == key), None)
                 values = {"ParameterKey": key, "ParameterValue": str(value), "UsePreviousValue": False}
                 if item:
@@ -79,99 +157,116 @@ class ChangeSet:
                 self.__change_and_wait(change_set_type, {"TemplateBody": template, **optional_arguments})
 
     def __change_and_wait(self, change_set_type, optional_arguments):
-        try:
-            cf.create_change_set(
-                StackName=self.stack,
-                ChangeSetName=self.name,
-                ChangeSetType=change_set_type,
-                **optional_arguments,
-                IncludeNestedStacks=self.nested_change_sets,
-            )
-            logger.info("Change set submitted, waiting for CloudFormation to calculate changes ...")
-            waiter = cf.get_waiter("change_set_create_complete")
-            waiter.wait(ChangeSetName=self.name, StackName=self.stack, WaiterConfig=dict(Delay=10, MaxAttempts=120))
-            logger.info("Change set created successfully")
-        except WaiterError as e:
-            status_reason = e.last_response.get("StatusReason", "")
+        self.client.create_change_set(
+            StackName=self.stack,
+            ChangeSetName=self.name,
+            ChangeSetType=change_set_type,
+            **optional_arguments,
+            IncludeNestedStacks=self.nested_change_sets,
+        )
+        logger.info("Change set submitted, waiting for CloudFormation to calculate changes ...")
+        poller = Poller("change set {}".format(self.name), POLL_DELAY, MAX_POLL_DELAY, timeout=TIMEOUT)
+        while True:
+            poller.sleep()
+            try:
+                change_set = self.client.describe_change_set(StackName=self.stack, ChangeSetName=self.name)
+            except ClientError as e:
+                poller.finish(e.response["Error"]["Code"])
+                logger.info(e.response["Error"].get("Message", ""))
+                sys.exit(1)
+            status = change_set["Status"]
+            if status in CREATING_STATES:
+                if poller.expired():
+                    poller.finish("timeout")
+                    logger.info("Change set wasn't created after {} seconds".format(TIMEOUT))
+                    sys.exit(1)
+                continue
+            poller.finish(status)
+            if status == "CREATE_COMPLETE":
+                logger.info("Change set created successfully")
+                return
+            status_reason = change_set.get("StatusReason", "")
             logger.info(status_reason)
             if "didn't contain changes" not in status_reason:
                 sys.exit(1)
+            return
 
     def __init__(self, stack, arn="", nested_change_sets=False):
         self.name = CHANGE_SET_FORMAT.format(stack=stack)
         self.stack = stack
         self.change_set_arn = arn
         self.nested_change_sets = nested_change_sets
+        self.client = aws.client("cloudformation")
+
+    def describe(self, print_metadata=True, actions=None, only_replacements=False):
+        """Print the changes of the change set and its nested change sets page by page as they are described
 
-    def describe(self, print_metadata=True):
+        Actions and only_replacements limit the printed rows to changes with one of the actions or replacing resources.
+        """
         if self.change_set_arn:
             cs_options = dict(ChangeSetName=self.change_set_arn)
         else:
             cs_options = dict(StackName=self.stack, ChangeSetName=self.name)
-        change_set = cf.describe_change_set(**cs_options)
-        table = Texttable(max_width=150)
-
-        if print_metadata:
-            logger.info("Deployment metadata:")
-            parameters = ", ".join(
-                [
-                    parameter["ParameterKey"] + "=" + parameter["ParameterValue"]
-                    for parameter in change_set.get("Parameters", [])
-                ]
-            )
-            table.add_row(["Parameters", parameters])
-            tags = [tag["Key"] + "=" + tag["Value"] for tag in change_set.get("Tags", [])]
-            table.add_row(["Tags ", ", ".join(tags)])
-            table.add_row(["Capabilities ", ", ".join(change_set.get("Capabilities", []))])
-            logger.info(table.draw() + "\n")
-            logger.info("Resource Changes:")
-
-        table.reset()
-        table = Texttable(max_width=150)
-        table.add_rows([CHANGE_SET_HEADER])
-
-        def __change_detail(change):
-            target_ = change["Target"]
-            attribute = target_["Attribute"]
-            if attribute == "Properties":
-                return target_.get("Name", "")
-            else:
-                return attribute
 
-        for change in change_set["Changes"]:
+        def shown(change):
             resource_change = change["ResourceChange"]
-            table.add_row(
-                [
-                    resource_change["Action"],
-                    resource_change["LogicalResourceId"],
-                    resource_change.get("PhysicalResourceId", ""),
-                    resource_change["ResourceType"],
-                    resource_change.get("Replacement", ""),
-                    ", ".join(sorted(set([__change_detail(c) for c in resource_change["Details"]]))),
-                ]
-            )
+            if actions and resource_change["Action"] not in actions:
+                return False
+            return not only_replacements or resource_change.get("Replacement") in REPLACING
 
-        logger.info(table.draw())
+        nested = {}
+        max_workers = aws.config.max_pool_connections if aws.config else NESTED_CHANGE_SET_CONCURRENCY
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
 
-        nested_change_sets = [
-            (change["ResourceChange"]["LogicalResourceId"], change["ResourceChange"]["ChangeSetId"])
-            for change in change_set["Changes"]
-            if change["ResourceChange"]["ResourceType"] == "AWS::CloudFormation::Stack"
-            and change["ResourceChange"].get("ChangeSetId")
-        ]
-        for nested_change_set in nested_change_sets:
-            logger.info(f"\nChanges for nested Stack: {nested_change_set[0]}")
-            ChangeSet(stack=self.stack, arn=nested_change_set[1]).describe(print_metadata=False)
+            def submit(changes):
+                # Nested change sets are described in the background while the changes of their parent are printed
+                for _, arn in nested_change_sets(changes):
+                    nested[arn] = executor.submit(describe_nested, arn)
+
+            def describe_nested(arn):
+                changes = []
+                for page in self.__pages(ChangeSetName=arn):
+                    submit(page["Changes"])
+                    changes.extend(page["Changes"])
+                return changes
+
+            changes = []
+            for number, page in enumerate(self.__pages(**cs_options)):
+                if number == 0:
+                    if print_metadata:
+                        print_metadata_table(page)
+                    print_changes_header()
+                submit(page["Changes"])
+                print_changes([change for change in page["Changes"] if shown(change)])
+                changes.extend(page["Changes"])
+
+            def print_nested(changes):
+                for logical_id, arn in nested_change_sets(changes):
+                    logger.info(f"\nChanges for nested Stack: {logical_id}")
+                    nested_changes = nested[arn].result()
+                    print_changes_header()
+                    print_changes([change for change in nested_changes if shown(change)])
+                    print_nested(nested_changes)
+
+            print_nested(changes)
+
+    def __pages(self, **options):
+        while True:
+            page = self.client.describe_change_set(**options)
+            yield page
+            if not page.get("NextToken"):
+                break
+            options["NextToken"] = page["NextToken"]
 
     def remove_existing_changeset(self):
         try:
-            id = cf.describe_change_set(StackName=self.stack, ChangeSetName=self.name)["ChangeSetId"]
+            id = self.client.describe_change_set(StackName=self.stack, ChangeSetName=self.name)["ChangeSetId"]
             logger.info("Removing existing change set")
-            cf.delete_change_set(ChangeSetName=id)
+            self.client.delete_change_set(ChangeSetName=id)
 
             # Sleep to let Cloudformation remove
             for _ in range(100):
-                cf.describe_change_set(StackName=self.stack, ChangeSetName=self.name)
+                self.client.describe_change_set(StackName=self.stack, ChangeSetName=self.name)
                 time.sleep(5)
             raise Exception("Old Change Set could not be removed, please retry")
         except ClientError as e:
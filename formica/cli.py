@@ -5,15 +5,15 @@ import functools
 import logging
 import signal
 import sys
-from botocore.exceptions import ClientError
 import argcomplete
 
 from . import CHANGE_SET_FORMAT, __version__
-from . import stack_set
-from . import aws
-import boto3
+from . import cache
+from . import file_index
+from . import polling
+from . import pool
 from .s3 import temporary_bucket
-from .helper import collect_vars, with_artifacts
+from .helper import ORGANIZATION_VARIABLES, collect_vars, with_artifacts
 
 STACK_HEADERS = ["Name", "Created At", "Updated At", "Status"]
 RESOURCE_HEADERS = ["Logical ID", "Physical ID", "Type", "Status"]
@@ -60,8 +60,27 @@ CONFIG_FILE_ARGUMENTS = {
     "artifacts": list,
     "upload_artifacts": bool,
     "nested_change_sets": bool,
+    "cache_dir": str,
+    "cache_max_size": int,
+    "jobs": int,
+    "files_ignore": list,
+    "max_pool_connections": int,
+    "retry_mode": str,
+    "identity_cache_ttl": int,
+    "organization_cache_ttl": int,
+    "region_source": str,
+    "partition": str,
+    "opted_in_regions": bool,
+    "poll_delay": int,
+    "rate_limits": dict,
+    "max_poll_delay": int,
 }
 
+RETRY_MODES = ["legacy", "standard", "adaptive"]
+REGION_SOURCES = ["api", "endpoints"]
+BATCH_COMMANDS = ["change", "deploy", "diff", "remove"]
+CHANGE_SET_ACTIONS = ["Add", "Modify", "Remove", "Import", "Dynamic"]
+
 
 class SplitEqualsAction(argparse.Action):
     def __call__(self, parser, namespace, values, option_string=None):
@@ -77,7 +96,14 @@ class SplitEqualsAction(argparse.Action):
 
 
 def formica():
-    main(sys.argv[1:])
+    from . import server
+
+    # Commands run on a running formica serve if there is one
+    code = server.forward(sys.argv[1:])
+    if code is None:
+        main(sys.argv[1:])
+    else:
+        sys.exit(code)
 
 
 def signal_handler(sig, frame):
@@ -89,8 +115,7 @@ def add_signal_handler():
     signal.signal(signal.SIGINT, signal_handler)
 
 
-def main(cli_args):
-    add_signal_handler()
+def create_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument("--version", action="version", version="{}".format(__version__))
     subparsers = parser.add_subparsers(title="commands", help="Available commands", dest="command")
@@ -101,9 +126,18 @@ def main(cli_args):
     add_config_file_argument(template_parser)
     add_stack_variables_argument(template_parser)
     template_parser.add_argument("-y", "--yaml", help="print output as yaml", action="store_true")
+    template_parser.add_argument(
+        "--watch", help="Watch the templates and print the template after every change", action="store_true"
+    )
+    template_parser.add_argument(
+        "--watch-diff", help="Watch the templates and print a diff after every change", action="store_true"
+    )
     add_artifacts_argument(template_parser)
     add_organization_account_template_variables(template_parser)
     add_aws_arguments(template_parser)
+    add_cache_arguments(template_parser)
+    add_jobs_argument(template_parser)
+    add_files_ignore_argument(template_parser)
     template_parser.set_defaults(func=template)
 
     # Stacks Command Arguments
@@ -128,6 +162,10 @@ def main(cli_args):
     add_organization_account_template_variables(new_parser)
     add_upload_artifacts(new_parser)
     add_nested_change_sets(new_parser)
+    add_change_set_filters(new_parser)
+    add_cache_arguments(new_parser)
+    add_jobs_argument(new_parser)
+    add_files_ignore_argument(new_parser)
     new_parser.set_defaults(func=new)
 
     # Change Command Arguments
@@ -148,6 +186,10 @@ def main(cli_args):
     add_use_previous(change_parser)
     add_upload_artifacts(change_parser)
     add_nested_change_sets(change_parser)
+    add_change_set_filters(change_parser)
+    add_cache_arguments(change_parser)
+    add_jobs_argument(change_parser)
+    add_files_ignore_argument(change_parser)
     change_parser.set_defaults(func=change)
 
     # Deploy Command Arguments
@@ -170,6 +212,12 @@ def main(cli_args):
     wait_parser = subparsers.add_parser("wait", description="Wait for a Stack to be deployed or removed")
     add_aws_arguments(wait_parser)
     add_stack_argument(wait_parser)
+    wait_parser.add_argument(
+        "--stacks",
+        help="Wait for several stacks, their status is polled together",
+        nargs="+",
+        metavar="STACK",
+    )
     add_config_file_argument(wait_parser)
     wait_parser.set_defaults(func=wait)
 
@@ -178,6 +226,7 @@ def main(cli_args):
     add_aws_arguments(describe_parser)
     add_stack_argument(describe_parser)
     add_config_file_argument(describe_parser)
+    add_change_set_filters(describe_parser)
     describe_parser.set_defaults(func=describe)
 
     # Diff Command Arguments
@@ -190,6 +239,9 @@ def main(cli_args):
     add_stack_tags_argument(diff_parser)
     add_organization_account_template_variables(diff_parser)
     add_artifacts_argument(diff_parser)
+    add_cache_arguments(diff_parser)
+    add_jobs_argument(diff_parser)
+    add_files_ignore_argument(diff_parser)
     diff_parser.set_defaults(func=diff)
 
     # Resources Command Arguments
@@ -203,13 +255,79 @@ def main(cli_args):
     remove_parser = subparsers.add_parser("remove", description="Remove the configured stack")
     add_aws_arguments(remove_parser)
     add_stack_argument(remove_parser)
+    remove_parser.add_argument(
+        "--stacks",
+        help="Remove several stacks, stacks importing exports of the others are removed first",
+        nargs="+",
+        metavar="STACK",
+    )
     add_role_arn_argument(remove_parser)
     add_config_file_argument(remove_parser)
     remove_parser.set_defaults(func=remove)
 
+    # Affected Command Arguments
+    affected_parser = subparsers.add_parser(
+        "affected", description="Print the config files whose stacks depend on the changed files"
+    )
+    affected_parser.add_argument(
+        "config_files", help="Config files of the stacks to check", nargs="+", metavar="CONFIG_FILE"
+    )
+    affected_parser.add_argument(
+        "--changed-files",
+        help="Changed files, read one per line from stdin if not set",
+        nargs="+",
+        metavar="PATH",
+    )
+    affected_parser.add_argument(
+        "--stacks", help="Print the stack names instead of the config files", action="store_true"
+    )
+    add_cache_arguments(affected_parser)
+    add_files_ignore_argument(affected_parser)
+    affected_parser.set_defaults(func=affected)
+
+    # Serve Command Arguments
+    serve_parser = subparsers.add_parser(
+        "serve", description="Keep formica running and run the commands of the formica CLI in it"
+    )
+    serve_parser.add_argument(
+        "--socket",
+        help="Unix socket to listen on, defaults to $FORMICA_SOCKET or $XDG_RUNTIME_DIR/formica/formica.sock",
+        metavar="PATH",
+    )
+    serve_parser.set_defaults(func=serve)
+
+    # Batch Command Arguments
+    batch_parser = subparsers.add_parser(
+        "batch", description="Run a command for the stacks of many config files in parallel"
+    )
+    batch_parser.add_argument("batch_command", help="The command to run for every stack", choices=BATCH_COMMANDS)
+    batch_parser.add_argument(
+        "paths", help="Config files or directories to search for config files", nargs="+", metavar="PATH"
+    )
+    batch_parser.add_argument(
+        "--concurrency", help="Number of stacks to run at the same time, defaults to 10", type=int, metavar="N"
+    )
+    batch_parser.add_argument(
+        "--waves",
+        help="Run stacks in waves so stacks only run after the stacks whose exports they import",
+        action="store_true",
+        default=False,
+    )
+    add_aws_arguments(batch_parser)
+    add_cache_arguments(batch_parser)
+    add_jobs_argument(batch_parser)
+    batch_parser.set_defaults(func=batch)
+
     # Stack Set Configuration
     stack_set_parser(subparsers)
 
+    return parser
+
+
+def main(cli_args):
+    add_signal_handler()
+    parser = create_parser()
+
     # Autocomplete
     argcomplete.autocomplete(parser)
 
@@ -221,20 +339,64 @@ def main(cli_args):
 
     args_dict = vars(args)
 
+    cache.initialize(args_dict.get("cache_dir"), args_dict.get("cache_max_size"))
+    pool.initialize(args_dict.get("jobs"))
+    file_index.initialize(args_dict.get("files_ignore"))
+    polling.configure(args_dict.get("poll_delay"), args_dict.get("max_poll_delay"))
+
+    try:
+        if requires_aws(args):
+            execute_with_aws(parser, args)
+        else:
+            # Rendering templates without AWS backed variables never loads botocore
+            execute(parser, args)
+    finally:
+        pool.shutdown()
+        cache.evict()
+
+
+def requires_aws(args):
+    args_dict = vars(args)
+    func = args_dict.get("func")
+    if func in [affected, serve]:
+        return False
+    if func == template:
+        return bool(args_dict.get("artifacts")) or any(args_dict.get(v) for v in ORGANIZATION_VARIABLES)
+    return True
+
+
+def execute(parser, args):
+    if vars(args).get("func"):
+        args.func(args)
+    else:
+        parser.print_usage()
+
+
+def execute_with_aws(parser, args):
     from botocore.exceptions import NoRegionError, ClientError, EndpointConnectionError
     from botocore.exceptions import ProfileNotFound, NoCredentialsError
+    from . import aws
 
+    args_dict = vars(args)
     try:
         # Initialise the AWS Profile and Region
-        aws.initialize(args_dict.get("region"), args_dict.get("profile"))
+        aws.initialize(
+            args_dict.get("region"),
+            args_dict.get("profile"),
+            max_pool_connections=args_dict.get("max_pool_connections"),
+            retry_mode=args_dict.get("retry_mode"),
+            identity_ttl=args_dict.get("identity_cache_ttl"),
+            organization_ttl=args_dict.get("organization_cache_ttl"),
+            refresh_organization=bool(args_dict.get("refresh_org_cache")),
+            regions_from=args_dict.get("region_source"),
+            regions_partition=args_dict.get("partition"),
+            only_opted_in_regions=bool(args_dict.get("opted_in_regions")),
+            rate_limits=rate_limits(args_dict.get("rate_limits")),
+        )
 
         convert_role_name_to_arn(args)
 
-        # Execute Function
-        if args_dict.get("func"):
-            args.func(args)
-        else:
-            parser.print_usage()
+        execute(parser, args)
     except (ProfileNotFound, NoCredentialsError, NoRegionError, EndpointConnectionError) as e:
         logger.info("Please make sure your credentials, regions and profiles are properly set:")
         logger.info(e)
@@ -248,17 +410,45 @@ def main(cli_args):
             sys.exit(2)
 
 
+def rate_limits(limits):
+    from .rate_limit import DEFAULT_RATES
+
+    checked = {}
+    for family, rate in (limits or {}).items():
+        if family not in DEFAULT_RATES:
+            logger.error("Rate limit {} needs to be one of {}".format(family, ", ".join(DEFAULT_RATES.keys())))
+            sys.exit(1)
+        try:
+            checked[family] = float(rate)
+        except (TypeError, ValueError):
+            logger.error("Rate limit of {} needs to be a number".format(family))
+            sys.exit(1)
+    return checked
+
+
 def convert_role_name_to_arn(args):
+    from . import aws
+
     args_dict = vars(args)
-    sts = boto3.client("sts")
     if args_dict.get("role_name") and not args_dict.get("role_arn"):
-        account_id = sts.get_caller_identity()["Account"]
+        account_id = aws.caller_identity()["Account"]
         args.role_arn = "arn:aws:iam::{}:role/{}".format(account_id, args.role_name)
     if args_dict.get("administration_role_name") and not args_dict.get("administration_role_arn"):
-        account_id = sts.get_caller_identity()["Account"]
+        account_id = aws.caller_identity()["Account"]
         args.administration_role_arn = "arn:aws:iam::{}:role/{}".format(account_id, args.administration_role_name)
 
 
+def stack_set_command(name):
+    """Look up the stack set command when it runs so only stack set commands import the stack_set module"""
+
+    def command(args):
+        from . import stack_set
+
+        getattr(stack_set, name)(args)
+
+    return command
+
+
 def stack_set_parser(parser):
     # Stack Set Commang Arguments
 
@@ -279,7 +469,10 @@ def stack_set_parser(parser):
     add_stack_variables_argument(create_parser)
     add_stack_set_role_argument(create_parser)
     add_organization_account_template_variables(create_parser)
-    create_parser.set_defaults(func=stack_set.create_stack_set)
+    add_cache_arguments(create_parser)
+    add_jobs_argument(create_parser)
+    add_files_ignore_argument(create_parser)
+    create_parser.set_defaults(func=stack_set_command("create_stack_set"))
 
     # Update
     update_parser = stack_set_subparsers.add_parser("update", description="Update a Stack Set")
@@ -298,14 +491,17 @@ def stack_set_parser(parser):
     add_organization_account_template_variables(update_parser)
     add_yes_parameter(update_parser)
     add_create_missing_argument(update_parser)
-    update_parser.set_defaults(func=stack_set.update_stack_set)
+    add_cache_arguments(update_parser)
+    add_jobs_argument(update_parser)
+    add_files_ignore_argument(update_parser)
+    update_parser.set_defaults(func=stack_set_command("update_stack_set"))
 
     # Remove
     remove_parser = stack_set_subparsers.add_parser("remove", description="Remove a Stack Set")
     add_aws_arguments(remove_parser)
     add_stack_set_argument(remove_parser)
     add_config_file_argument(remove_parser)
-    remove_parser.set_defaults(func=stack_set.remove_stack_set)
+    remove_parser.set_defaults(func=stack_set_command("remove_stack_set"))
 
     # Add Instances
     add_instances_parser = stack_set_subparsers.add_parser("add-instances", description="Add Stack Set Instances")
@@ -316,7 +512,7 @@ def stack_set_parser(parser):
     add_stack_set_main_auto_regions_accounts(add_instances_parser)
     add_stack_set_operation_preferences(add_instances_parser)
     add_yes_parameter(add_instances_parser)
-    add_instances_parser.set_defaults(func=stack_set.add_stack_set_instances)
+    add_instances_parser.set_defaults(func=stack_set_command("add_stack_set_instances"))
 
     # Remove Instances
     remove_instances_parser = stack_set_subparsers.add_parser(
@@ -330,7 +526,7 @@ def stack_set_parser(parser):
     add_stack_set_main_auto_regions_accounts(remove_instances_parser)
     add_stack_set_operation_preferences(remove_instances_parser)
     add_yes_parameter(remove_instances_parser)
-    remove_instances_parser.set_defaults(func=stack_set.remove_stack_set_instances)
+    remove_instances_parser.set_defaults(func=stack_set_command("remove_stack_set_instances"))
 
     # Diff
     diff_parser = stack_set_subparsers.add_parser(
@@ -344,7 +540,10 @@ def stack_set_parser(parser):
     add_stack_variables_argument(diff_parser)
     add_organization_account_template_variables(diff_parser)
     add_stack_set_main_account_parameter(diff_parser)
-    diff_parser.set_defaults(func=stack_set.diff_stack_set)
+    add_cache_arguments(diff_parser)
+    add_jobs_argument(diff_parser)
+    add_files_ignore_argument(diff_parser)
+    diff_parser.set_defaults(func=stack_set_command("diff_stack_set"))
 
 
 def requires_stack(function):
@@ -363,6 +562,67 @@ def requires_stack(function):
 def add_aws_arguments(parser):
     parser.add_argument("--region", help="The AWS region to use", metavar="REGION", default=None)
     parser.add_argument("--profile", help="The AWS profile to use", metavar="PROFILE", default=None)
+    parser.add_argument(
+        "--max-pool-connections",
+        help="Maximum number of connections each AWS client keeps open",
+        type=int,
+        metavar="N",
+    )
+    parser.add_argument("--retry-mode", help="Retry mode of the AWS clients", choices=RETRY_MODES)
+    parser.add_argument(
+        "--identity-cache-ttl",
+        help="Seconds to cache the AWS caller identity on disk between runs",
+        type=int,
+        metavar="SECONDS",
+    )
+    parser.add_argument(
+        "--organization-cache-ttl",
+        help="Seconds to cache the accounts and regions of the organization on disk between runs",
+        type=int,
+        metavar="SECONDS",
+    )
+    parser.add_argument(
+        "--refresh-org-cache",
+        help="Fetch accounts and regions from AWS even if they are cached",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--region-source",
+        help="Get the available regions from the EC2 API or from the endpoint data shipped with botocore",
+        choices=REGION_SOURCES,
+    )
+    parser.add_argument(
+        "--partition",
+        help="Partition to list regions of with --region-source endpoints, defaults to the partition of the region",
+        metavar="PARTITION",
+    )
+    parser.add_argument(
+        "--opted-in-regions",
+        help="Only list regions enabled for the account with --region-source endpoints",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--rate-limits",
+        help="Requests per second sent to the describe, list and change API families of CloudFormation, 0 turns "
+        "the limit off",
+        nargs="+",
+        action=SplitEqualsAction,
+        metavar="FAMILY=RATE",
+    )
+    parser.add_argument(
+        "--poll-delay",
+        help="Seconds to wait before first polling a stack, change set or StackSet operation",
+        type=int,
+        metavar="SECONDS",
+    )
+    parser.add_argument(
+        "--max-poll-delay",
+        help="Longest time in seconds between two polls, the delay grows up to it while waiting",
+        type=int,
+        metavar="SECONDS",
+    )
 
 
 def add_stack_argument(parser):
@@ -499,6 +759,28 @@ def add_config_file_argument(parser):
     )
 
 
+def add_cache_arguments(parser):
+    parser.add_argument("--cache-dir", help="Directory to cache compiled templates in", metavar="DIR")
+    parser.add_argument(
+        "--cache-max-size", help="Maximum size of the cache directory in MB, 0 disables caching", type=int
+    )
+
+
+def add_jobs_argument(parser):
+    parser.add_argument(
+        "--jobs", "-j", help="Number of processes to render template files and modules with", type=int, metavar="N"
+    )
+
+
+def add_files_ignore_argument(parser):
+    parser.add_argument(
+        "--files-ignore",
+        help="Files and directories the files() template function ignores",
+        nargs="+",
+        metavar="PATTERN",
+    )
+
+
 def add_s3_upload_argument(parser):
     parser.add_argument("--s3", help="Upload template to S3 before deployment", action="store_true")
 
@@ -539,28 +821,73 @@ def add_nested_change_sets(parser):
     parser.add_argument("--nested-change-sets", help="Create a ChangeSet for nested Stacks", action="store_true")
 
 
+def add_change_set_filters(parser):
+    parser.add_argument(
+        "--only-replacements",
+        help="Only print changes that replace or might replace resources",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--action",
+        help="Only print changes with one of the actions",
+        choices=CHANGE_SET_ACTIONS,
+        nargs="+",
+        dest="actions",
+    )
+
+
 def template(args):
     from .loader import Loader
-    import yaml
 
     variables = collect_vars(args)
 
-    loader = Loader(variables=variables)
-    loader.load()
-    if args.yaml:
-        logger.info(
-            loader.template(
-                dumper=functools.partial(yaml.safe_dump, default_flow_style=False)
-            ).strip()  # strip trailing newline to avoid blank line in output
-        )
+    if vars(args).get("watch") or vars(args).get("watch_diff"):
+        from .watch import watch
+
+        watch(variables, functools.partial(template_output, yaml_output=args.yaml), diff=args.watch_diff)
     else:
-        logger.info(loader.template(indent=4, separators=(",", ": ")))
+        loader = Loader(variables=variables)
+        loader.load()
+        logger.info(template_output(loader, args.yaml))
+
+
+def template_output(loader, yaml_output):
+    import yaml
+
+    if yaml_output:
+        return loader.template(
+            dumper=functools.partial(yaml.safe_dump, default_flow_style=False)
+        ).strip()  # strip trailing newline to avoid blank line in output
+    else:
+        return loader.template(indent=4, separators=(",", ": "))
+
+
+def affected(args):
+    from .affected import affected_config_files, stack_name
+
+    changed_files = args.changed_files
+    if changed_files is None:
+        changed_files = [line.strip() for line in sys.stdin if line.strip()]
+    for config_file in affected_config_files(args.config_files, changed_files):
+        logger.info(stack_name(config_file) if args.stacks else config_file)
+
+
+def batch(args):
+    from .batch import batch
+
+    batch(args.batch_command, args.paths, args.concurrency, ordered=args.waves)
+
+
+def serve(args):
+    from . import server
+
+    server.serve(args.socket)
 
 
 def stacks(args):
     from texttable import Texttable
 
-    client = boto3.client("cloudformation")
+    client = cloudformation_client()
     stacks = client.describe_stacks()
     table = Texttable(max_width=150)
     table.add_rows([STACK_HEADERS])
@@ -577,7 +904,10 @@ def stacks(args):
 def diff(args):
     from .diff import compare_stack
 
-    compare_stack(stack=args.stack, vars=collect_vars(args), parameters=args.parameters, tags=args.tags)
+    if vars(args).get("loader"):
+        compare_stack(stack=args.stack, parameters=args.parameters, tags=args.tags, loader=args.loader)
+    else:
+        compare_stack(stack=args.stack, vars=collect_vars(args), parameters=args.parameters, tags=args.tags)
 
 
 @requires_stack
@@ -585,7 +915,7 @@ def describe(args):
     from .change_set import ChangeSet
 
     change_set = ChangeSet(stack=args.stack)
-    change_set.describe()
+    change_set.describe(actions=args.actions, only_replacements=args.only_replacements)
 
 
 @requires_stack
@@ -614,8 +944,8 @@ def resources(args):
 
 @requires_stack
 def change(args):
+    from botocore.exceptions import ClientError
     from .change_set import ChangeSet
-    from .loader import Loader
 
     client = cloudformation_client()
 
@@ -645,9 +975,7 @@ def change(args):
     if args.use_previous_template:
         options["use_previous_template"] = True
     else:
-        loader = Loader(variables=collect_vars(args))
-        loader.load()
-        options["template"] = loader.template(indent=None)
+        options["template"] = load_template(args).template(indent=None)
 
     if args.use_previous_parameters:
         options["use_previous_parameters"] = True
@@ -660,11 +988,24 @@ def change(args):
             change_set.create(**options)
     else:
         change_set.create(**options)
-    change_set.describe()
+    change_set.describe(actions=args.actions, only_replacements=args.only_replacements)
+
+
+def load_template(args):
+    """The loaded template of the stack, formica batch loads it ahead of time from the directory of the stack"""
+    loader = vars(args).get("loader")
+    if loader is None:
+        from .loader import Loader
+
+        loader = Loader(variables=collect_vars(args))
+        loader.load()
+    return loader
 
 
 def cloudformation_client():
-    client = boto3.client("cloudformation")
+    from . import aws
+
+    client = aws.client("cloudformation")
     return client
 
 
@@ -709,16 +1050,34 @@ def cancel(args, client):
     client.cancel_update_stack(StackName=args.stack)
 
 
+def wait(args):
+    if vars(args).get("stacks"):
+        from .stack_waiter import MultiStackWaiter
+
+        MultiStackWaiter(args.stacks).wait()
+    else:
+        wait_stack(args)
+
+
 @requires_stack
 @wait_for_stack
-def wait(args, client):
+def wait_stack(args, client):
     logger.info("Waiting for Stack {}".format(args.stack))
     pass
 
 
+def remove(args):
+    if vars(args).get("stacks"):
+        from .teardown import remove_stacks
+
+        remove_stacks(args.stacks, role_arn=args.role_arn)
+    else:
+        remove_stack(args)
+
+
 @requires_stack
 @wait_for_stack
-def remove(args, client):
+def remove_stack(args, client):
     logger.info("Removing Stack and waiting for it to be removed, ...")
     if args.role_arn:
         client.delete_stack(StackName=args.stack, RoleARN=args.role_arn)
@@ -729,10 +1088,8 @@ def remove(args, client):
 @requires_stack
 def new(args):
     from .change_set import ChangeSet
-    from .loader import Loader
 
-    loader = Loader(variables=collect_vars(args))
-    loader.load()
+    loader = load_template(args)
     logger.info("Creating change set for new stack, ...")
     change_set = ChangeSet(stack=args.stack, nested_change_sets=args.nested_change_sets)
     options = dict(
@@ -753,7 +1110,7 @@ def new(args):
             change_set.create(**options)
     else:
         change_set.create(**options)
-    change_set.describe()
+    change_set.describe(actions=args.actions, only_replacements=args.only_replacements)
     logger.info("Change set created, please deploy")
 
 
@@ -0,0 +1,112 @@
+import re
+
+SUBSTITUTION = re.compile(r"\$\{([^}!][^}]*)\}")
+
+
+class Context(object):
+    """Values Ref and Fn::Sub resolve to while reading the exports and imports of a template"""
+
+    def __init__(self, stack, region=None, parameters=None, template=None):
+        self.values = {"AWS::StackName": stack}
+        if region:
+            self.values["AWS::Region"] = region
+        for key, parameter in ((template or {}).get("Parameters") or {}).items():
+            if isinstance(parameter, dict) and "Default" in parameter:
+                self.values[key] = str(parameter["Default"])
+        for key, value in (parameters or {}).items():
+            self.values[key] = str(value)
+
+
+def resolve(value, context):
+    """The string an export name or imported value resolves to, None if it depends on values known only to AWS"""
+    if isinstance(value, str):
+        return value
+    if not isinstance(value, dict) or len(value) != 1:
+        return None
+    function, argument = list(value.items())[0]
+    if function == "Ref":
+        return context.values.get(argument)
+    if function == "Fn::Sub":
+        variables = {}
+        if isinstance(argument, list) and len(argument) == 2:
+            argument, mapping = argument
+            for key, variable in (mapping or {}).items():
+                variables[key] = resolve(variable, context)
+        if not isinstance(argument, str):
+            return None
+        names = SUBSTITUTION.findall(argument)
+        values = {name: variables.get(name, context.values.get(name)) for name in names}
+        if any(v is None for v in values.values()):
+            return None
+        return SUBSTITUTION.sub(lambda match: values[match.group(1)], argument)
+    if function == "Fn::Join" and isinstance(argument, list) and len(argument) == 2:
+        delimiter, parts = argument
+        if not isinstance(parts, list):
+            return None
+        resolved = [resolve(part, context) for part in parts]
+        if not isinstance(delimiter, str) or any(part is None for part in resolved):
+            return None
+        return delimiter.join(resolved)
+    return None
+
+
+def exports(template, context):
+    """Names of the exports a template declares in its Outputs"""
+    names = set()
+    for output in (template.get("Outputs") or {}).values():
+        export = output.get("Export") if isinstance(output, dict) else None
+        if isinstance(export, dict):
+            name = resolve(export.get("Name"), context)
+            if name:
+                names.add(name)
+    return names
+
+
+def imports(template, context):
+    """Names of the exports a template imports with Fn::ImportValue"""
+    names = set()
+
+    def walk(value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key == "Fn::ImportValue":
+                    name = resolve(item, context)
+                    if name:
+                        names.add(name)
+                else:
+                    walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+
+    walk(template)
+    return names
+
+
+def dependency_graph(exported, imported):
+    """Stacks every stack depends on, from the exports and imports of each stack
+
+    Imports of exports that no stack of the batch declares belong to stacks outside of it and are ignored.
+    """
+    exporters = {}
+    for stack, names in exported.items():
+        for name in names:
+            exporters[name] = stack
+    return {
+        stack: {exporters[name] for name in names if name in exporters and exporters[name] != stack}
+        for stack, names in imported.items()
+    }
+
+
+def waves(graph):
+    """Groups of stacks that only depend on stacks of earlier groups, and the stacks left over because of cycles"""
+    remaining = {stack: set(depends_on) for stack, depends_on in graph.items()}
+    result = []
+    while remaining:
+        wave = sorted(stack for stack, depends_on in remaining.items() if not depends_on & remaining.keys())
+        if not wave:
+            return result, sorted(remaining)
+        result.append(wave)
+        for stack in wave:
+            del remaining[stack]
+    return result, []
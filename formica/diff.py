@@ -1,12 +1,10 @@
 import collections
 import re
-import yaml
 import logging
-from deepdiff import DeepDiff
-import boto3
 from texttable import Texttable
 
 from formica.loader import Loader
+from formica import aws, yaml_tags
 
 logger = logging.getLogger(__name__)
 
@@ -30,29 +28,30 @@ def convert(data):
         return data
 
 
-def compare_stack(stack, vars=None, parameters={}, tags={}):
-    client = boto3.client("cloudformation")
+def compare_stack(stack, vars=None, parameters={}, tags={}, loader=None):
+    client = aws.client("cloudformation")
     template = client.get_template(StackName=stack)["TemplateBody"]
 
     stack = client.describe_stacks(StackName=stack)["Stacks"][0]
-    __compare(template, stack, vars, parameters, tags)
+    __compare(template, stack, vars, parameters, tags, loader=loader)
 
 
 def compare_stack_set(stack, vars=None, parameters={}, tags={}, main_account_parameter=False):
-    client = boto3.client("cloudformation")
+    client = aws.client("cloudformation")
 
     stack_set = client.describe_stack_set(StackSetName=stack)["StackSet"]
     __compare(stack_set["TemplateBody"], stack_set, vars, parameters, tags, main_account_parameter)
 
 
-def __compare(template, stack, vars=None, parameters={}, tags={}, main_account_parameter=False):
+def __compare(template, stack, vars=None, parameters={}, tags={}, main_account_parameter=False, loader=None):
     current_parameters = {p["ParameterKey"]: p["ParameterValue"] for p in (stack.get("Parameters", []))}
     parameters = {key: str(value) for key, value in parameters.items()}
     tags = {key: str(value) for key, value in tags.items()}
     current_tags = {p["Key"]: p["Value"] for p in (stack.get("Tags", []))}
 
-    loader = Loader(variables=vars, main_account_parameter=main_account_parameter)
-    loader.load()
+    if loader is None:
+        loader = Loader(variables=vars, main_account_parameter=main_account_parameter)
+        loader.load()
     deployed_template = convert(template)
     template_parameters = {
         key: str(value["Default"]).lower() if type(value["Default"]) == bool else str(value["Default"])
@@ -62,7 +61,7 @@ def __compare(template, stack, vars=None, parameters={}, tags={}, main_account_p
 
     template_parameters.update(parameters)
     if isinstance(deployed_template, str):
-        deployed_template = yaml.full_load(deployed_template)
+        deployed_template = yaml_tags.load(deployed_template)
 
     __generate_table("Parameters", current_parameters, template_parameters)
     __generate_table("Tags", current_tags, tags)
@@ -70,6 +69,8 @@ def __compare(template, stack, vars=None, parameters={}, tags={}, main_account_p
 
 
 def __generate_table(header, current, new):
+    from deepdiff import DeepDiff
+
     changes = DeepDiff(current, new, ignore_order=False, report_repetition=True, verbose_level=2, view="tree")
     table = Texttable(max_width=200)
     table.set_cols_dtype(["t", "t", "t", "t"])
@@ -0,0 +1,86 @@
+import fnmatch
+import functools
+import os
+import re
+
+# Patterns of files and directories the files() template function never looks at
+ignore = []
+
+
+def initialize(ignore_patterns=None):
+    global ignore
+    ignore = list(ignore_patterns or [])
+
+
+@functools.lru_cache(maxsize=None)
+def pattern(glob):
+    return re.compile(fnmatch.translate(glob), re.IGNORECASE)
+
+
+class FileIndex(object):
+    """Directory listings of the project, every directory is read at most once per run"""
+
+    def __init__(self, ignore_patterns=None):
+        self.ignore = ignore if ignore_patterns is None else ignore_patterns
+        self.listings = {}
+        self.tree = None
+        self.tree_directories = None
+        self.globs = {}
+
+    def scan(self, path):
+        path = os.path.normpath(path)
+        if path not in self.listings:
+            names = []
+            directories = set()
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    names.append(entry.name)
+                    if entry.is_dir():
+                        directories.add(entry.name)
+            self.listings[path] = (names, directories)
+        return self.listings[path]
+
+    def listdir(self, path):
+        return self.scan(path)[0]
+
+    def isdir(self, path):
+        parent, name = os.path.split(os.path.normpath(path))
+        if not name or name in (".", ".."):
+            return os.path.isdir(path)
+        try:
+            return name in self.scan(parent or ".")[1]
+        except OSError:
+            return False
+
+    def match(self, path, glob):
+        expression = pattern(glob)
+        return [name for name in self.listdir(path) if expression.match(name)]
+
+    def ignored(self, path):
+        name = os.path.basename(path)
+        return any(fnmatch.fnmatch(path, p) or fnmatch.fnmatch(name, p) for p in self.ignore)
+
+    def files(self):
+        """All files below the current directory as relative paths, the same as FileSystemLoader.list_templates"""
+        if self.tree is None:
+            found = set()
+            directories = set()
+            for dirpath, dirnames, filenames in os.walk(".", followlinks=True):
+                directories.add(os.path.normpath(dirpath))
+                relative = os.path.relpath(dirpath, ".")
+                relative = "" if relative == "." else relative.replace(os.path.sep, "/") + "/"
+                dirnames[:] = [d for d in dirnames if not self.ignored(relative + d)]
+                found.update(relative + f for f in filenames if not self.ignored(relative + f))
+            self.tree = sorted(found)
+            self.tree_directories = sorted(directories)
+        return self.tree
+
+    def directories(self):
+        """All directories files() looked at"""
+        self.files()
+        return self.tree_directories
+
+    def glob(self, glob):
+        if glob not in self.globs:
+            self.globs[glob] = fnmatch.filter(self.files(), glob)
+        return self.globs[glob]
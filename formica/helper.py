@@ -1,5 +1,11 @@
+import os
+from contextlib import contextmanager
+
 from .s3 import temporary_bucket
 
+# Arguments that add variables looked up in the AWS organization, templates using them can't be rendered offline
+ORGANIZATION_VARIABLES = ["organization_variables", "organization_region_variables", "organization_account_variables"]
+
 
 def name(*names):
     name = "".join(map(lambda name: name.title(), names))
@@ -7,6 +13,17 @@ def name(*names):
     return name
 
 
+@contextmanager
+def config_directory(config_file):
+    """Run in the directory of the config file, config files are written to be used from their own directory"""
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(config_file))
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
 def collect_stack_set_vars(args):
     variables = args.vars or {}
     if args.organization_variables:
@@ -35,30 +52,37 @@ def accounts_and_regions():
 
 
 def aws_regions():
-    import boto3
+    from . import aws
+
+    def describe_regions():
+        ec2 = aws.client("ec2")
+        return [r["RegionName"] for r in ec2.describe_regions()["Regions"]]
 
-    ec2 = boto3.client("ec2")
-    regions = ec2.describe_regions()
-    regions = [r["RegionName"] for r in regions["Regions"]]
+    if aws.region_source == "endpoints":
+        regions = aws.endpoint_regions(aws.partition)
+        if aws.opted_in_regions:
+            enabled = aws.organization_lookup("regions", describe_regions)
+            regions = [r for r in regions if r in enabled]
+    else:
+        regions = aws.organization_lookup("regions", describe_regions)
     return {"AWSRegions": regions}
 
 
 def aws_accounts():
-    import boto3
-
-    organizations = boto3.client("organizations")
-    sts = boto3.client("sts")
-
-    paginator = organizations.get_paginator("list_accounts")
-
-    pages = paginator.paginate()
-    accounts = [
-        {"Id": a["Id"], "Name": a["Name"], "Email": a["Email"]}
-        for page in pages
-        for a in page["Accounts"]
-        if a["Status"] == "ACTIVE"
-    ]
-    account_id = sts.get_caller_identity()["Account"]
+    from . import aws
+
+    def list_accounts():
+        organizations = aws.client("organizations")
+        paginator = organizations.get_paginator("list_accounts")
+        return [
+            {"Id": a["Id"], "Name": a["Name"], "Email": a["Email"]}
+            for page in paginator.paginate()
+            for a in page["Accounts"]
+            if a["Status"] == "ACTIVE"
+        ]
+
+    accounts = aws.organization_lookup("accounts", list_accounts)
+    account_id = aws.caller_identity()["Account"]
     return {
         "AWSMainAccount": [a for a in accounts if a["Id"] == account_id][0],
         "AWSAccounts": accounts,
@@ -67,11 +91,9 @@ def aws_accounts():
 
 
 def main_account_id():
-    import boto3
+    from . import aws
 
-    sts = boto3.client("sts")
-    identity = sts.get_caller_identity()
-    return identity["Account"]
+    return aws.caller_identity()["Account"]
 
 
 def artifact_variables(artifacts, seed):
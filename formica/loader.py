@@ -1,23 +1,23 @@
+import copy
 import json
 import os
+import pickle
 import sys
-import re
 
 import logging
 import yaml
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, meta, nodes
+from jinja2.bccache import Bucket
 from jinja2.exceptions import TemplateSyntaxError, TemplateNotFound, UndefinedError
 import arrow
-import fnmatch
 
 from .exceptions import FormicaArgumentException
 
+from . import __version__, cache, pool
 from . import yaml_tags
+from .file_index import FileIndex
 from .helper import main_account_id
 
-# To silence pyflakes warning of unused import
-assert yaml_tags
-
 logger = logging.getLogger(__name__)
 
 FILE_TYPES = ["yml", "yaml", "json"]
@@ -37,6 +37,9 @@ ALLOWED_ATTRIBUTES = {
     "Outputs": dict,
 }
 
+# Compiled templates by bytecode cache key, formica serve keeps them in memory between commands
+compiled = None
+
 
 def code_escape(source):
     return source.replace("\n", "\\n").replace('"', '\\"')
@@ -66,14 +69,76 @@ def novalue(variable):
     return False if variable is False else 0 if variable == 0 else (variable or '{"Ref": "AWS::NoValue"}')
 
 
+class BytecodeCache(FileSystemBytecodeCache):
+    """Jinja bytecode cache keyed on the template source hash with a size cap shared with the formica cache"""
+
+    def __init__(self, directory):
+        super(BytecodeCache, self).__init__(directory, "%s.bytecode")
+
+    def get_bucket(self, environment, name, filename, source):
+        checksum = self.get_source_checksum(source)
+        key = self.get_cache_key("{}:{}".format(name, checksum), filename)
+        bucket = Bucket(environment, key, checksum)
+        self.load_bytecode(bucket)
+        return bucket
+
+    def load_bytecode(self, bucket):
+        if compiled is not None and bucket.key in compiled:
+            bucket.code = compiled[bucket.key]
+            return
+        super(BytecodeCache, self).load_bytecode(bucket)
+        if bucket.code is not None:
+            cache.touch(self._get_cache_filename(bucket))
+            if compiled is not None:
+                compiled[bucket.key] = bucket.code
+
+    def dump_bytecode(self, bucket):
+        super(BytecodeCache, self).dump_bytecode(bucket)
+        if compiled is not None:
+            compiled[bucket.key] = bucket.code
+
+
+class RecordingFileSystemLoader(FileSystemLoader):
+    """FileSystemLoader that records the file of every template it loads"""
+
+    def __init__(self, searchpath, dependencies, **kwargs):
+        super(RecordingFileSystemLoader, self).__init__(searchpath, **kwargs)
+        self.dependencies = dependencies
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = super(RecordingFileSystemLoader, self).get_source(environment, template)
+        self.dependencies.add(os.path.normpath(filename))
+        return source, filename, uptodate
+
+
+def bytecode_cache():
+    directory = cache.path("bytecode")
+    if directory:
+        return BytecodeCache(directory)
+    return None
+
+
 class Loader(object):
-    def __init__(self, path=".", filename="*", variables=None, main_account_parameter=False):
+    def __init__(self, path=".", filename="*", variables=None, main_account_parameter=False, modules=None, index=None):
         if variables is None:
             variables = {}
+        # Module results and directory listings of this run, shared with all module loaders
+        self.modules = {} if modules is None else modules
+        self.index = FileIndex() if index is None else index
         self.cftemplate = {}
         self.path = path
         self.filename = filename
-        self.env = Environment(loader=FileSystemLoader("./", followlinks=True))
+        self.dependencies = set()
+        self.directories = set()
+        # Directories whose whole tree was listed
+        self.trees = set()
+        self.cacheable = True
+        self.result = None
+        self.pending = None
+        self.env = Environment(
+            loader=RecordingFileSystemLoader("./", self.dependencies, followlinks=True),
+            bytecode_cache=bytecode_cache(),
+        )
         self.env.filters.update(
             {
                 "code_escape": code_escape,
@@ -94,7 +159,19 @@ class Loader(object):
         return self.render(filename, **args)
 
     def list_files(self, filter="*"):
-        return [t for t in self.env.list_templates() if fnmatch.fnmatch(t, filter)]
+        # The result depends on the whole tree, validating it on every load would cost as much as rendering
+        self.cacheable = False
+        self.directories.update(self.index.directories())
+        self.trees.add(".")
+        return list(self.index.glob(filter))
+
+    def now(self, *args, **kwargs):
+        self.cacheable = False
+        return arrow.now(*args, **kwargs)
+
+    def utcnow(self):
+        self.cacheable = False
+        return arrow.utcnow()
 
     def render(self, filename, **args):
         template_path = os.path.normpath("{}/{}".format(self.path, filename))
@@ -106,8 +183,8 @@ class Loader(object):
             code=self.include_file,
             file=self.load_file,
             files=self.list_files,
-            now=arrow.now,
-            utcnow=arrow.utcnow,
+            now=self.now,
+            utcnow=self.utcnow,
             **variables,
         )
         return template.render(**arguments)
@@ -132,13 +209,16 @@ class Loader(object):
                     if new_type == str or new_type == list:
                         self.cftemplate[key] = new
                     elif new_type == dict:
+                        modules = self.start_modules(template[key]) if key == RESOURCES_KEY else {}
                         for element_key, element_value in template[key].items():
                             if (
                                 key == RESOURCES_KEY
                                 and isinstance(element_value, dict)
                                 and MODULE_KEY in element_value
                             ):
-                                self.load_module(element_value[MODULE_KEY], element_key, element_value)
+                                self.load_module(
+                                    element_value[MODULE_KEY], element_key, element_value, modules.get(element_key)
+                                )
                             else:
                                 self.cftemplate.setdefault(key, {})[element_key] = element_value
                 else:
@@ -147,10 +227,22 @@ class Loader(object):
         else:
             logger.info("File {} is empty".format(file))
 
-    def load_module(self, module_path, element_key, element_value):
+    def start_modules(self, resources):
+        """Create the loaders of all modules in resources and start rendering them in the process pool"""
+        modules = {}
+        if pool.executor():
+            for element_key, element_value in resources.items():
+                if isinstance(element_value, dict) and MODULE_KEY in element_value:
+                    loader = self.module_loader(element_value[MODULE_KEY], element_key, element_value)
+                    if loader.module_key() not in self.modules:
+                        loader.start()
+                    modules[element_key] = loader
+        return modules
+
+    def module_loader(self, module_path, element_key, element_value):
         path_elements = module_path.split("::")
-        dir_pattern = re.compile(fnmatch.translate(path_elements.pop(0)), re.IGNORECASE)
-        matched_dirs = [dir for dir in os.listdir(self.path) if dir_pattern.match(dir)]
+        self.directories.add(os.path.normpath(self.path))
+        matched_dirs = self.index.match(self.path, path_elements.pop(0))
         matched_dir = module_path
         if matched_dirs:
             matched_dir = matched_dirs[0]
@@ -159,7 +251,7 @@ class Loader(object):
 
         file_name = "*"
 
-        if not os.path.isdir(module_path):
+        if not self.index.isdir(module_path):
             file_name = module_path.split("/")[-1]
             module_path = "/".join(module_path.split("/")[:-1])
 
@@ -167,9 +259,76 @@ class Loader(object):
         properties["module_name"] = element_key
         vars = self.merge_variables(properties)
 
-        loader = Loader(module_path, file_name, vars)
-        loader.load()
-        self.merge(loader.template_dictionary(), file=file_name)
+        return Loader(module_path, file_name, vars, modules=self.modules, index=self.index)
+
+    def module_key(self):
+        names = self.referenced_variables()
+        variables = self.variables
+        if names is not None:
+            variables = {name: value for name, value in variables.items() if name in names}
+        return cache.key(os.path.normpath(self.path), self.filename, variables)
+
+    def referenced_variables(self):
+        """Names of the variables the templates of the module and the files they include use
+
+        Returns None if an included file isn't known before rendering, the module then depends on all variables.
+        """
+        memo_key = ("variables", os.path.normpath(self.path), self.filename)
+        if memo_key not in self.modules:
+            self.modules[memo_key] = self.find_referenced_variables()
+        return self.modules[memo_key]
+
+    def find_referenced_variables(self):
+        names = set()
+        pending = ["{}/{}".format(self.path, file) for file in self.template_files()]
+        parsed = set()
+        while pending:
+            template_path = os.path.normpath(pending.pop())
+            if template_path in parsed:
+                continue
+            parsed.add(template_path)
+            try:
+                with open(template_path) as f:
+                    ast = self.env.parse(f.read())
+            except (OSError, UnicodeDecodeError, TemplateSyntaxError):
+                return None
+            names.update(meta.find_undeclared_variables(ast))
+            for reference in meta.find_referenced_templates(ast):
+                if reference is None:
+                    return None
+                pending.append(reference)
+            # Files included with code and file get all variables of the module
+            for call in ast.find_all(nodes.Call):
+                if isinstance(call.node, nodes.Name) and call.node.name in ("code", "file"):
+                    if not call.args or not isinstance(call.args[0], nodes.Const):
+                        return None
+                    pending.append("{}/{}".format(self.path, call.args[0].value))
+        return names
+
+    def load_module(self, module_path, element_key, element_value, loader=None):
+        if loader is None:
+            loader = self.module_loader(module_path, element_key, element_value)
+        key = loader.module_key()
+        module = self.modules.get(key) if key else None
+        if module:
+            template = copy.deepcopy(module["template"])
+        else:
+            loader.load()
+            template = loader.template_dictionary()
+            module = dict(
+                template=copy.deepcopy(template),
+                dependencies=loader.dependencies,
+                directories=loader.directories,
+                trees=loader.trees,
+                cacheable=loader.cacheable,
+            )
+            if key:
+                self.modules[key] = module
+        self.dependencies.update(module["dependencies"])
+        self.directories.update(module["directories"])
+        self.trees.update(module["trees"])
+        self.cacheable = self.cacheable and module["cacheable"]
+        self.merge(template, file=loader.filename)
 
     def merge_variables(self, module_vars):
         merged_vars = {}
@@ -179,47 +338,136 @@ class Loader(object):
             merged_vars[k] = v
         return merged_vars
 
+    def cache_key(self):
+        return cache.key(__version__, os.path.abspath(self.path), self.filename, self.variables)
+
+    def cached_result(self):
+        if self.result is None:
+            self.result = False
+            key = cache.enabled() and self.cache_key()
+            result = key and cache.load("templates", key)
+            if result and self.valid_result(result):
+                self.result = result
+        return self.result
+
+    def valid_result(self, result):
+        for file_name, digest in result["files"].items():
+            if cache.file_digest(file_name) != digest:
+                return False
+        for directory, digest in result["directories"].items():
+            if self.directory_digest(directory) != digest:
+                return False
+        return True
+
+    def store_result(self):
+        key = cache.enabled() and self.cache_key()
+        if key and self.cacheable:
+            result = dict(
+                files={file_name: cache.file_digest(file_name) for file_name in self.dependencies},
+                directories={directory: self.directory_digest(directory) for directory in self.directories},
+                template=self.cftemplate,
+            )
+            cache.store("templates", key, result)
+
+    def directory_digest(self, directory):
+        try:
+            return cache.key(sorted(self.index.listdir(directory)))
+        except OSError:
+            return None
+
     def load(self):
-        files = []
+        result = self.cached_result()
+        if result:
+            self.cftemplate = result["template"]
+            self.dependencies.update(result["files"].keys())
+            self.directories.update(result["directories"].keys())
+        else:
+            self.render_templates()
+            self.store_result()
 
+        if self.main_account_parameter:
+            self.cftemplate["Parameters"] = self.cftemplate.get("Parameters") or {}
+            self.cftemplate["Parameters"]["MainAccount"] = {"Type": "String", "Default": main_account_id()}
+
+    def template_files(self):
+        files = []
+        self.directories.add(os.path.normpath(self.path))
         for file_type in FILE_TYPES:
-            pattern = re.compile(fnmatch.translate("{}.template.{}".format(self.filename, file_type)), re.IGNORECASE)
-            files.extend([filename for filename in os.listdir(self.path) if pattern.match(filename)])
+            files.extend(self.index.match(self.path, "{}.template.{}".format(self.filename, file_type)))
+        return files
+
+    def start(self):
+        """Submit all template files to the process pool, load picks up the results in order"""
+        executor = pool.executor()
+        if not executor or self.pending is not None or self.cached_result() or not self.index.isdir(self.path):
+            return
+        try:
+            pickle.dumps(self.variables)
+        except Exception:
+            # Variables that can't be sent to other processes are rendered in this process
+            return
+        cwd = os.getcwd()
+        self.pending = {
+            file: executor.submit(render_file, cwd, self.path, self.filename, self.variables, file)
+            for file in self.template_files()
+        }
+
+    def render_templates(self):
+        files = self.template_files()
 
         if not files:
             logger.info("Could not find any template files in {}".format(self.path))
             sys.exit(1)
 
+        self.start()
         for file in files:
-            try:
-                result = str(self.render(os.path.basename(file), **self.variables))
-                template = yaml.full_load(result)
-            except TemplateNotFound as e:
-                logger.info("File not found" + ": " + e.message)
-                logger.info('In: "' + file + '"')
-                sys.exit(1)
-            except TemplateSyntaxError as e:
-                logger.info(e.__class__.__name__ + ": " + e.message)
-                logger.info('File: "' + (e.filename or file) + '", line ' + str(e.lineno))
-                sys.exit(1)
-            except UndefinedError as e:
-                logger.info(e.__class__.__name__ + ": " + e.message)
-                logger.info('In: "' + file + '"')
-                sys.exit(1)
-            except FormicaArgumentException as e:
-                logger.info(e.__class__.__name__ + ": " + e.args[0])
-                logger.info('For Template: "' + file + '"')
-                logger.info("If you use it as a template make sure you're setting all necessary vars")
-                sys.exit(1)
-            except yaml.YAMLError as e:
-                logger.info(e.__str__())
-                logger.info("Following is the Yaml document formica is trying to load:")
-                logger.info("---------------------------------------------------------------------------")
-                logger.info(result)
-                logger.info("---------------------------------------------------------------------------")
+            if self.pending and file in self.pending:
+                template, errors, dependencies, directories, trees, cacheable = self.pending[file].result()
+                self.dependencies.update(dependencies)
+                self.directories.update(directories)
+                self.trees.update(trees)
+                self.cacheable = self.cacheable and cacheable
+            else:
+                template, errors = self.parse_template(file)
+            if errors:
+                for error in errors:
+                    logger.info(error)
                 sys.exit(1)
             self.merge(template, file)
 
-        if self.main_account_parameter:
-            self.cftemplate["Parameters"] = self.cftemplate.get("Parameters") or {}
-            self.cftemplate["Parameters"]["MainAccount"] = {"Type": "String", "Default": main_account_id()}
+    def parse_template(self, file):
+        result = ""
+        try:
+            result = str(self.render(os.path.basename(file), **self.variables))
+            return yaml_tags.load(result), []
+        except TemplateNotFound as e:
+            return None, ["File not found" + ": " + e.message, 'In: "' + file + '"']
+        except TemplateSyntaxError as e:
+            return None, [
+                e.__class__.__name__ + ": " + e.message,
+                'File: "' + (e.filename or file) + '", line ' + str(e.lineno),
+            ]
+        except UndefinedError as e:
+            return None, [e.__class__.__name__ + ": " + e.message, 'In: "' + file + '"']
+        except FormicaArgumentException as e:
+            return None, [
+                e.__class__.__name__ + ": " + e.args[0],
+                'For Template: "' + file + '"',
+                "If you use it as a template make sure you're setting all necessary vars",
+            ]
+        except yaml.YAMLError as e:
+            return None, [
+                e.__str__(),
+                "Following is the Yaml document formica is trying to load:",
+                "---------------------------------------------------------------------------",
+                result,
+                "---------------------------------------------------------------------------",
+            ]
+
+
+def render_file(cwd, path, filename, variables, file):
+    """Render and parse a single template file in a process pool worker"""
+    os.chdir(cwd)
+    loader = Loader(path, filename, variables, index=pool.index)
+    template, errors = loader.parse_template(file)
+    return template, errors, loader.dependencies, loader.directories, loader.trees, loader.cacheable
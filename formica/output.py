@@ -0,0 +1,38 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+import formica
+
+_current = threading.local()
+
+
+class PrefixFormatter(logging.Formatter):
+    """Prefixes every line logged by a thread with the prefix it set, e.g. the name of the stack it works on"""
+
+    def format(self, record):
+        message = super(PrefixFormatter, self).format(record)
+        prefix = getattr(_current, "prefix", None)
+        if not prefix:
+            return message
+        return "\n".join("[{}] {}".format(prefix, line) for line in message.split("\n"))
+
+
+@contextmanager
+def prefixed(prefix):
+    previous = getattr(_current, "prefix", None)
+    _current.prefix = prefix
+    try:
+        yield
+    finally:
+        _current.prefix = previous
+
+
+@contextmanager
+def prefixed_output():
+    formatter = formica.handler.formatter
+    formica.handler.setFormatter(PrefixFormatter("%(message)s"))
+    try:
+        yield
+    finally:
+        formica.handler.setFormatter(formatter)
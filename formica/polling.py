@@ -0,0 +1,60 @@
+import logging
+import random
+import time
+from time import monotonic
+
+logger = logging.getLogger(__name__)
+
+BACKOFF = 1.5
+# Delay backing off starts from when polling without an initial delay
+MIN_BACKOFF_DELAY = 1
+# Fraction every delay is randomly shortened or lengthened by so parallel waits don't poll in lockstep
+JITTER = 0.2
+# Seconds before the first poll and the longest time between polls, set for every wait through formica's arguments
+initial_delay = None
+max_delay = None
+
+
+def configure(delay=None, maximum=None):
+    global initial_delay, max_delay
+    initial_delay = delay
+    max_delay = maximum
+
+
+class Poller:
+    """Sleeps between the polls of an operation formica waits for
+
+    The delay starts short, as most operations finish quickly, and grows exponentially with jitter up to a maximum.
+    Progress of the operation resets it so changes are followed closely.
+    """
+
+    def __init__(self, name, delay, maximum, timeout=0):
+        self.name = name
+        self.initial = delay if initial_delay is None else initial_delay
+        self.maximum = max(maximum if max_delay is None else max_delay, self.initial)
+        self.timeout = timeout
+        self.delay = self.initial
+        self.polls = 0
+        self.start = monotonic()
+
+    def sleep(self):
+        time.sleep(self.delay * random.uniform(1 - JITTER, 1 + JITTER))
+        self.polls += 1
+        self.delay = min(max(self.delay * BACKOFF, MIN_BACKOFF_DELAY), self.maximum)
+
+    def reset(self):
+        self.delay = self.initial
+
+    def elapsed(self):
+        return monotonic() - self.start
+
+    def expired(self):
+        return self.timeout > 0 and self.elapsed() > self.timeout
+
+    def finish(self, outcome):
+        """Log how long the wait took, at debug level so regular output stays the same"""
+        logger.debug(
+            "Waited {:.1f}s for {} to finish with {} after {} polls".format(
+                self.elapsed(), self.name, outcome, self.polls
+            )
+        )
@@ -0,0 +1,44 @@
+from . import cache, file_index
+
+jobs = 1
+_executor = None
+# Directory listings of a worker process
+index = None
+
+
+def initialize(number_of_jobs=None):
+    global jobs
+    shutdown()
+    jobs = number_of_jobs or 1
+
+
+def executor():
+    global _executor
+    if jobs <= 1:
+        return None
+    if _executor is None:
+        from concurrent.futures import ProcessPoolExecutor
+
+        _executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=initialize_worker,
+            initargs=(cache.directory, cache.max_size, file_index.ignore),
+        )
+    return _executor
+
+
+def initialize_worker(cache_directory, cache_max_size, ignore_patterns):
+    global jobs, index
+    # Workers render in process and never start a pool of their own
+    jobs = 1
+    cache.directory = cache_directory
+    cache.max_size = cache_max_size
+    file_index.initialize(ignore_patterns)
+    index = file_index.FileIndex()
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
@@ -0,0 +1,85 @@
+import threading
+import time
+from time import monotonic
+
+# Requests per second formica sends to each API family of CloudFormation, per account and region
+DEFAULT_RATES = {"describe": 4, "list": 4, "change": 2}
+# Seconds of requests a bucket holds, so short bursts go out without waiting
+BURST = 2
+
+rates = dict(DEFAULT_RATES)
+_buckets = {}
+_lock = threading.Lock()
+
+
+def configure(limits=None):
+    """Set the rate of API families from FAMILY=RATE pairs, a rate of 0 turns limiting the family off"""
+    global rates
+    configured = dict(DEFAULT_RATES)
+    for name, rate in (limits or {}).items():
+        if name not in DEFAULT_RATES:
+            raise ValueError(
+                "Unknown API family {}, use one of {}".format(name, ", ".join(sorted(DEFAULT_RATES.keys())))
+            )
+        configured[name] = float(rate)
+    if configured != rates:
+        rates = configured
+        reset()
+
+
+def reset():
+    with _lock:
+        _buckets.clear()
+
+
+def family(operation):
+    """API family of a CloudFormation operation, families share one limit"""
+    if operation.startswith(("Describe", "Get", "Detect", "Estimate", "Validate")):
+        return "describe"
+    if operation.startswith("List"):
+        return "list"
+    return "change"
+
+
+class TokenBucket:
+    """Hands out rate tokens per second, up to capacity of them at once
+
+    Callers reserve a token even if none is left and wait until it is refilled, so waiting threads are served in the
+    order they asked.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def limited(operation):
+    return rates.get(family(operation), 0) > 0
+
+
+def acquire(account, region, operation):
+    """Wait until the account may call the operation in the region again"""
+    name = family(operation)
+    rate = rates.get(name, 0)
+    if rate <= 0:
+        return 0
+    key = (account, region, name)
+    with _lock:
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(rate, max(1, rate * BURST))
+        bucket = _buckets[key]
+    return bucket.acquire()
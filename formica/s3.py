@@ -1,4 +1,3 @@
-import boto3
 from contextlib import contextmanager
 import logging
 from hashlib import md5
@@ -14,9 +13,11 @@ BLOCKSIZE_MULTI = 512
 
 class TemporaryS3Bucket(object):
     def __init__(self, seed):
+        from . import aws
+
         self.objects = {}
         self.uploaded = False
-        self.__sts = boto3.client("sts")
+        self.__sts = aws.client("sts")
         self.s3_bucket = None
         self.files = {}
         self.seed = seed
@@ -44,10 +45,12 @@ class TemporaryS3Bucket(object):
 
     @property
     def name(self):
+        from . import aws
+
         body_hashes = "".join(
             [key for key, _ in self.objects.items()] + [key for key, _ in self.files.items()]
         ).encode()
-        account_id = self.__sts.get_caller_identity()["Account"]
+        account_id = aws.caller_identity()["Account"]
         to_hash = self.seed + account_id + self.__sts.meta.region_name + body_hashes.decode()
         name_digest_input = BytesIO(to_hash.encode())
         body_hashes_hash = self.__digest(name_digest_input)
@@ -55,7 +58,9 @@ class TemporaryS3Bucket(object):
 
     def upload(self):
         if not self.uploaded:
-            s3 = boto3.resource("s3")
+            from . import aws
+
+            s3 = aws.resource("s3")
             self.uploaded = True
             self.s3_bucket = s3.Bucket(self.name)
             try:
@@ -0,0 +1,284 @@
+import io
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import traceback
+import _thread
+
+logger = logging.getLogger(__name__)
+
+SOCKET_VARIABLE = "FORMICA_SOCKET"
+
+# Every message is a one byte type and the length of its payload followed by the payload
+HEADER = struct.Struct("!cI")
+REQUEST = b"r"
+STDOUT = b"o"
+STDERR = b"e"
+INPUT = b"i"
+INTERRUPT = b"c"
+EXIT = b"x"
+
+INPUT_POLL_INTERVAL = 0.1
+READER_TIMEOUT = 1
+
+
+def default_socket():
+    """Socket in the runtime directory of the user, kept apart from the cache so evicting it never removes the socket"""
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, "formica", "formica.sock")
+    return os.path.join(tempfile.gettempdir(), "formica-{}".format(os.getuid()), "formica.sock")
+
+
+def socket_path(path=None):
+    return path or os.environ.get(SOCKET_VARIABLE) or default_socket()
+
+
+def send(connection, kind, payload=b""):
+    connection.sendall(HEADER.pack(kind, len(payload)) + payload)
+
+
+def receive_exactly(connection, size):
+    data = b""
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise EOFError("Connection closed")
+        data += chunk
+    return data
+
+
+def receive(connection):
+    kind, size = HEADER.unpack(receive_exactly(connection, HEADER.size))
+    return kind, receive_exactly(connection, size)
+
+
+class Output(io.TextIOBase):
+    """Text stream that forwards everything written to it to the client"""
+
+    def __init__(self, connection, kind):
+        self.connection = connection
+        self.kind = kind
+
+    @property
+    def encoding(self):
+        return "utf-8"
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        send(self.connection, self.kind, text.encode("utf-8"))
+        return len(text)
+
+
+class Input(io.TextIOBase):
+    """Text stream that reads lines from the stdin of the client when they are needed"""
+
+    def __init__(self, connection, lines):
+        self.connection = connection
+        self.lines = lines
+        self.closed_by_client = False
+
+    @property
+    def encoding(self):
+        return "utf-8"
+
+    def readable(self):
+        return True
+
+    def readline(self, size=-1):
+        if self.closed_by_client:
+            return ""
+        send(self.connection, INPUT)
+        while True:
+            try:
+                line = self.lines.get(timeout=INPUT_POLL_INTERVAL)
+                break
+            except queue.Empty:
+                continue
+        if not line:
+            self.closed_by_client = True
+        return line
+
+    def read(self, size=-1):
+        return "".join(iter(self.readline, ""))
+
+
+def read_client(connection, lines, finished):
+    """Hand input lines to the running command and pass ctrl-c of the client on as an interrupt"""
+    while True:
+        try:
+            kind, payload = receive(connection)
+        except (EOFError, OSError):
+            lines.put("")
+            if not finished.is_set():
+                _thread.interrupt_main()
+            return
+        if kind == INPUT:
+            lines.put(payload.decode("utf-8"))
+        elif kind == INTERRUPT and not finished.is_set():
+            _thread.interrupt_main()
+
+
+def run(argv):
+    from . import cli
+
+    try:
+        cli.main(argv)
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        sys.stderr.write("{}\n".format(e.code))
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def handle(connection):
+    """Run the command of one client with its working directory, environment and standard streams"""
+    import formica
+
+    kind, payload = receive(connection)
+    if kind != REQUEST:
+        return
+    request = json.loads(payload.decode("utf-8"))
+    lines = queue.Queue()
+    finished = threading.Event()
+    reader = threading.Thread(target=read_client, args=(connection, lines, finished), daemon=True)
+
+    cwd = os.getcwd()
+    environment = dict(os.environ)
+    streams = sys.stdin, sys.stdout, sys.stderr
+    program = sys.argv
+    stdout = Output(connection, STDOUT)
+    stream = formica.handler.setStream(stdout)
+    try:
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        sys.stdin, sys.stdout, sys.stderr = Input(connection, lines), stdout, Output(connection, STDERR)
+        sys.argv = [request["program"]] + request["argv"]
+        reader.start()
+        code = run(request["argv"])
+        finished.set()
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = streams
+        sys.argv = program
+        formica.handler.setStream(stream)
+        os.environ.clear()
+        os.environ.update(environment)
+        os.chdir(cwd)
+    send(connection, EXIT, str(code).encode())
+    # The client closes the connection once it has the exit code
+    reader.join(READER_TIMEOUT)
+
+
+def serve(path=None):
+    from . import loader
+
+    path = socket_path(path)
+    running = forward_connection(path)
+    if running is not None:
+        running.close()
+        logger.info("formica is already serving on {}".format(path))
+        sys.exit(1)
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+
+    loader.compiled = {}
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Commands run with the credentials of the server, so only its user may connect
+    umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(umask)
+    server.listen()
+    logger.info("Serving formica on {}".format(path))
+    try:
+        # Commands share the state of the process, so they run one after another
+        while True:
+            connection, _ = server.accept()
+            with connection:
+                try:
+                    handle(connection)
+                except (EOFError, OSError, KeyboardInterrupt):
+                    pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def forward_connection(path):
+    # Commands send the environment of the client, so only a server of the same user gets them
+    if not os.path.exists(path) or os.stat(path).st_uid != os.getuid():
+        return None
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(path)
+    except OSError:
+        connection.close()
+        return None
+    return connection
+
+
+def client(connection, argv, stdin=None, stdout=None, stderr=None):
+    """Send a command to the server and replay its output, returns its exit code"""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout.buffer
+    stderr = stderr or sys.stderr.buffer
+    request = dict(program=sys.argv[0], argv=argv, cwd=os.getcwd(), env=dict(os.environ))
+    send(connection, REQUEST, json.dumps(request).encode("utf-8"))
+    handler = None
+    if threading.current_thread() is threading.main_thread():
+        # ctrl-c is handled by the command on the server, just like it would be when running locally
+        handler = signal.signal(signal.SIGINT, lambda sig, frame: send(connection, INTERRUPT))
+    try:
+        while True:
+            kind, payload = receive(connection)
+            if kind == STDOUT:
+                stdout.write(payload)
+                stdout.flush()
+            elif kind == STDERR:
+                stderr.write(payload)
+                stderr.flush()
+            elif kind == INPUT:
+                send(connection, INPUT, stdin.readline().encode("utf-8"))
+            elif kind == EXIT:
+                return int(payload.decode())
+    finally:
+        if handler is not None:
+            signal.signal(signal.SIGINT, handler)
+
+
+def forward(argv, path=None):
+    """Run the command on a running formica serve, returns None if there is none to run it locally"""
+    if (argv and argv[0] == "serve") or "_ARGCOMPLETE" in os.environ:
+        return None
+    connection = forward_connection(socket_path(path))
+    if connection is None:
+        return None
+    with connection:
+        try:
+            return client(connection, argv)
+        except EOFError:
+            logger.info("The connection to formica serve was closed")
+            return 1
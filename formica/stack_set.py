@@ -1,9 +1,9 @@
 import logging
 import sys
-import time
 from botocore.exceptions import ClientError
-import boto3
 
+from . import aws
+from .polling import Poller
 from .helper import collect_stack_set_vars, main_account_id, aws_accounts, aws_regions
 from .diff import compare_stack_set
 from texttable import Texttable
@@ -12,6 +12,9 @@ logger = logging.getLogger(__name__)
 
 STACK_SET_SUCCESS_STATES = ["SUCCEEDED"]
 STACK_SET_RUNNING_STATES = ["RUNNING", "STOPPING"]
+# Seconds between polls of a StackSet operation
+POLL_DELAY = 2
+MAX_POLL_DELAY = 30
 
 
 def requires_stack_set(function):
@@ -48,7 +51,7 @@ def ack(message):
 @requires_stack_set
 def update_stack_set(args):
     if args.create_missing:
-        client = boto3.client("cloudformation")
+        client = aws.client("cloudformation")
         try:
             client.describe_stack_set(StackSetName=args.stack_set)
         except ClientError as e:
@@ -76,7 +79,7 @@ def update_stack_set(args):
 @requires_stack_set
 def create_stack_set(args):
     try:
-        client = boto3.client("cloudformation")
+        client = aws.client("cloudformation")
         client.describe_stack_set(StackSetName=args.stack_set)
         logger.info(f"Stack Set {args.stack_set} already exists")
     except ClientError as e:
@@ -89,7 +92,7 @@ def create_stack_set(args):
 
 @requires_stack_set
 def remove_stack_set(args):
-    client = boto3.client("cloudformation")
+    client = aws.client("cloudformation")
     client.delete_stack_set(StackSetName=args.stack_set)
     logger.info("Removed StackSet with name {}".format(args.stack_set))
 
@@ -108,7 +111,7 @@ def accounts_table(accounts_map):
 @requires_stack_set
 @requires_accounts_regions
 def add_stack_set_instances(args):
-    client = boto3.client("cloudformation")
+    client = aws.client("cloudformation")
     paginator = client.get_paginator("list_stack_instances")
     deployed = [
         {"Account": stack["Account"], "Region": stack["Region"]}
@@ -153,7 +156,7 @@ def add_stack_set_instances(args):
 @requires_stack_set
 @requires_accounts_regions
 def remove_stack_set_instances(args):
-    client = boto3.client("cloudformation")
+    client = aws.client("cloudformation")
     preferences = operation_preferences(args)
     acc = accounts(args)
     reg = regions(args)
@@ -184,11 +187,12 @@ def diff_stack_set(args):
 
 def wait_for_stack_set_operation(stack_set_name, operation_id):
     logger.info("Waiting for StackSet Operation {} on StackSet {} to finish".format(operation_id, stack_set_name))
-    client = boto3.client("cloudformation")
+    client = aws.client("cloudformation")
+    poller = Poller("StackSet Operation {}".format(operation_id), POLL_DELAY, MAX_POLL_DELAY)
     finished = False
     status = ""
     while not finished:
-        time.sleep(5)
+        poller.sleep()
         status = client.describe_stack_set_operation(StackSetName=stack_set_name, OperationId=operation_id)[
             "StackSetOperation"
         ]["Status"]
@@ -198,6 +202,7 @@ def wait_for_stack_set_operation(stack_set_name, operation_id):
         else:
             finished = True
             logger.info("")
+    poller.finish(status)
 
     logger.info("StackSet Operation finished with Status: {}".format(status))
     if status not in STACK_SET_SUCCESS_STATES:
@@ -238,7 +243,7 @@ def regions(args):
 def __manage_stack_set(args, create):
     from .loader import Loader
 
-    client = boto3.client("cloudformation")
+    client = aws.client("cloudformation")
     params = args.parameters or {}
     account_regions = {}
     if not create:
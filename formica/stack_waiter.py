@@ -1,11 +1,13 @@
 import sys
-import time
 from datetime import datetime
-import boto3
 
 import logging
 from texttable import Texttable
 
+from . import aws
+from .output import prefixed, prefixed_output
+from .polling import Poller
+
 EVENT_TABLE_HEADERS = ["Timestamp", "Status", "Type", "Logical ID", "Status reason"]
 
 TABLE_COLUMN_SIZE = [28, 24, 30, 30, 50]
@@ -23,27 +25,30 @@ FAILED_STATES = [
 
 logger = logging.getLogger(__name__)
 
-SLEEP_TIME = 5
-
-cf = boto3.client("cloudformation")
+# Seconds between polls of a stack, the status of many stacks at once is polled less often
+POLL_DELAY = 2
+MAX_POLL_DELAY = 10
+MULTI_STACK_POLL_DELAY = 5
+MULTI_STACK_MAX_POLL_DELAY = 30
 
 
 class StackWaiter:
     def __init__(self, stack, timeout=0):
         self.stack = stack
         self.timeout = timeout
+        self.client = aws.client("cloudformation")
 
     def wait(self, last_event):
         header_printed = False
         finished = False
         canceled = False
         start = datetime.now()
+        poller = Poller("stack {}".format(self.stack), POLL_DELAY, MAX_POLL_DELAY)
         while not finished:
-            stack_events = cf.describe_stack_events(StackName=self.stack)["StackEvents"]
-            index = next((i for i, v in enumerate(stack_events) if v["EventId"] == last_event))
-            last_event = stack_events[0]["EventId"]
-            new_events = stack_events[0:index]
+            new_events = self.new_events(last_event)
             if new_events:
+                poller.reset()
+                last_event = new_events[0]["EventId"]
                 if not header_printed:
                     self.print_header()
                     header_printed = True
@@ -51,19 +56,35 @@ class StackWaiter:
             stack_status = self.stack_status()
             if stack_status in SUCCESSFUL_STATES:
                 finished = True
+                poller.finish(stack_status)
                 logger.info("Stack Status Successful: {}".format(stack_status))
             elif stack_status in FAILED_STATES:
+                poller.finish(stack_status)
                 logger.info("Stack Status Failed: {}".format(stack_status))
                 sys.exit(1)
             elif not canceled and self.timeout > 0 and (datetime.now() - start).seconds > (self.timeout * 60):
                 logger.info("Timeout of {} minute(s) reached. Canceling Update.".format(self.timeout))
                 canceled = True
-                cf.cancel_update_stack(StackName=self.stack)
+                self.client.cancel_update_stack(StackName=self.stack)
             else:
-                time.sleep(SLEEP_TIME)
+                poller.sleep()
+
+    def new_events(self, last_event):
+        """Events after last_event, newest first, reading pages of events only until last_event is reached"""
+        events = []
+        options = dict(StackName=self.stack)
+        while True:
+            page = self.client.describe_stack_events(**options)
+            for event in page["StackEvents"]:
+                if event["EventId"] == last_event:
+                    return events
+                events.append(event)
+            if not page.get("NextToken"):
+                return events
+            options["NextToken"] = page["NextToken"]
 
     def stack_status(self):
-        return cf.describe_stacks(StackName=self.stack)["Stacks"][0]["StackStatus"]
+        return self.client.describe_stacks(StackName=self.stack)["Stacks"][0]["StackStatus"]
 
     def __create_table(self):
         table = Texttable()
@@ -92,3 +113,83 @@ class StackWaiter:
                 ]
             )
         logger.info(table.draw())
+
+
+class MultiStackWaiter:
+    """Waits for several stacks at once
+
+    The status of all stacks is read from one paginated listing of the stacks in the region on every poll, events are
+    only read for stacks whose status or last update changed since the previous poll.
+    """
+
+    def __init__(self, stacks):
+        self.client = aws.client("cloudformation")
+        self.names = {}
+        self.waiters = {}
+        self.last_events = {}
+        self.states = {}
+        for stack in stacks:
+            description = self.client.describe_stacks(StackName=stack)["Stacks"][0]
+            stack_id = description["StackId"]
+            self.names[stack_id] = description.get("StackName", stack)
+            self.waiters[stack_id] = StackWaiter(stack_id)
+            self.last_events[stack_id] = self.client.describe_stack_events(StackName=stack_id)["StackEvents"][0][
+                "EventId"
+            ]
+            self.states[stack_id] = self.state(description)
+
+    @staticmethod
+    def state(description):
+        return description["StackStatus"], description.get("LastUpdatedTime")
+
+    def descriptions(self, stack_ids):
+        """Descriptions of the stacks, paging through the stacks of the region only until all of them were found"""
+        found = {}
+        for page in self.client.get_paginator("describe_stacks").paginate():
+            for description in page["Stacks"]:
+                if description["StackId"] in stack_ids:
+                    found[description["StackId"]] = description
+            if len(found) == len(stack_ids):
+                break
+        for stack_id in stack_ids - found.keys():
+            # Deleted stacks aren't listed anymore but can still be described by their id
+            found[stack_id] = self.client.describe_stacks(StackName=stack_id)["Stacks"][0]
+        return found
+
+    def wait(self):
+        pending = set(self.names)
+        failed = []
+        header_printed = False
+        poller = Poller("{} stacks".format(len(pending)), MULTI_STACK_POLL_DELAY, MULTI_STACK_MAX_POLL_DELAY)
+        with prefixed_output():
+            while pending:
+                descriptions = self.descriptions(pending)
+                for stack_id in sorted(pending, key=self.names.get):
+                    description = descriptions[stack_id]
+                    waiter = self.waiters[stack_id]
+                    with prefixed(self.names[stack_id]):
+                        if self.state(description) != self.states[stack_id]:
+                            poller.reset()
+                            self.states[stack_id] = self.state(description)
+                            new_events = waiter.new_events(self.last_events[stack_id])
+                            if new_events:
+                                self.last_events[stack_id] = new_events[0]["EventId"]
+                                if not header_printed:
+                                    with prefixed(None):
+                                        waiter.print_header()
+                                    header_printed = True
+                                waiter.print_events(new_events)
+                        stack_status = description["StackStatus"]
+                        if stack_status in SUCCESSFUL_STATES:
+                            pending.remove(stack_id)
+                            logger.info("Stack Status Successful: {}".format(stack_status))
+                        elif stack_status in FAILED_STATES:
+                            pending.remove(stack_id)
+                            failed.append(self.names[stack_id])
+                            logger.info("Stack Status Failed: {}".format(stack_status))
+                if pending:
+                    poller.sleep()
+        poller.finish("{} failed".format(len(failed)) if failed else "success")
+        if failed:
+            logger.info("Stacks failed: {}".format(", ".join(sorted(failed))))
+            sys.exit(1)
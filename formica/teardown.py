@@ -0,0 +1,147 @@
+import logging
+import sys
+
+from botocore.exceptions import ClientError
+from texttable import Texttable
+
+from . import aws
+from .polling import Poller
+
+logger = logging.getLogger(__name__)
+
+POLL_DELAY = 5
+MAX_POLL_DELAY = 30
+
+DELETE_IN_PROGRESS = "DELETE_IN_PROGRESS"
+DELETE_COMPLETE = "DELETE_COMPLETE"
+DELETE_FAILED = "DELETE_FAILED"
+NOT_FOUND = "NOT_FOUND"
+SKIPPED = "SKIPPED"
+FINISHED_STATES = [DELETE_COMPLETE, DELETE_FAILED]
+
+SUMMARY_HEADERS = ["Stack", "Status", "Reason"]
+
+
+class Teardown(object):
+    """Removes several stacks, a stack is deleted once every stack importing its exports is deleted
+
+    Independent stacks are deleted at the same time and one loop waits for all of them.
+    """
+
+    def __init__(self, stacks, role_arn=None):
+        self.client = aws.client("cloudformation")
+        self.stacks = list(dict.fromkeys(stacks))
+        self.role_arn = role_arn
+        self.ids = {}
+        self.status = {}
+        self.reasons = {}
+
+    def describe(self):
+        for stack in self.stacks:
+            try:
+                description = self.client.describe_stacks(StackName=stack)["Stacks"][0]
+            except ClientError as e:
+                error = e.response["Error"]
+                if error["Code"] == "ValidationError" and "does not exist" in error["Message"]:
+                    self.status[stack] = NOT_FOUND
+                    self.reasons[stack] = "Stack does not exist"
+                    continue
+                raise e
+            self.ids[stack] = description["StackId"]
+
+    def imports(self, export_name):
+        try:
+            return [
+                stack
+                for page in self.client.get_paginator("list_imports").paginate(ExportName=export_name)
+                for stack in page["Imports"]
+            ]
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ValidationError" and "not imported" in e.response["Error"]["Message"]:
+                return []
+            raise e
+
+    def importers(self):
+        """Stacks importing the exports of every stack, read from the exports currently deployed"""
+        names = {stack_id: stack for stack, stack_id in self.ids.items()}
+        importers = {stack: set() for stack in self.ids}
+        for page in self.client.get_paginator("list_exports").paginate():
+            for export in page["Exports"]:
+                exporter = names.get(export["ExportingStackId"])
+                if exporter is None:
+                    continue
+                for importer in self.imports(export["Name"]):
+                    if importer == exporter:
+                        continue
+                    if importer not in importers:
+                        self.reasons[exporter] = "Export {} is imported by {}".format(export["Name"], importer)
+                    importers[exporter].add(importer)
+        return importers
+
+    def delete(self, stack):
+        logger.info("Removing Stack {}".format(stack))
+        if self.role_arn:
+            self.client.delete_stack(StackName=stack, RoleARN=self.role_arn)
+        else:
+            self.client.delete_stack(StackName=stack)
+        self.status[stack] = DELETE_IN_PROGRESS
+
+    def poll(self, stack):
+        description = self.client.describe_stacks(StackName=self.ids[stack])["Stacks"][0]
+        status = description["StackStatus"]
+        if status != self.status[stack]:
+            logger.info("{}: {}".format(stack, status))
+            self.status[stack] = status
+        if status == DELETE_FAILED:
+            self.reasons[stack] = description.get("StackStatusReason", "")
+        return status in FINISHED_STATES
+
+    def remove(self):
+        self.describe()
+        importers = self.importers()
+        pending = set(importers)
+        deleting = set()
+        poller = Poller("removal of {} stacks".format(len(self.stacks)), POLL_DELAY, MAX_POLL_DELAY)
+        while pending or deleting:
+            for stack in sorted(pending):
+                # Importers outside of the removed stacks or ones that failed keep the exports of the stack in use
+                blocking = sorted(
+                    importer
+                    for importer in importers[stack]
+                    if importer not in self.ids or self.status.get(importer) in [DELETE_FAILED, SKIPPED]
+                )
+                if blocking:
+                    pending.remove(stack)
+                    self.status[stack] = SKIPPED
+                    self.reasons.setdefault(stack, "{} was not removed".format(", ".join(blocking)))
+                elif all(self.status.get(importer) == DELETE_COMPLETE for importer in importers[stack]):
+                    pending.remove(stack)
+                    deleting.add(stack)
+                    self.delete(stack)
+                    poller.reset()
+            if not deleting:
+                for stack in pending:
+                    self.status[stack] = SKIPPED
+                    self.reasons[stack] = "Stacks import each other's exports"
+                break
+            poller.sleep()
+            deleting = {stack for stack in deleting if not self.poll(stack)}
+        removed = [stack for stack in self.stacks if self.status.get(stack) == DELETE_COMPLETE]
+        poller.finish("{} of {} stacks removed".format(len(removed), len(self.stacks)))
+        return self.summary()
+
+    def summary(self):
+        table = Texttable(max_width=150)
+        table.add_rows([SUMMARY_HEADERS])
+        for stack in self.stacks:
+            table.add_row([stack, self.status.get(stack, ""), self.reasons.get(stack, "")])
+        logger.info(table.draw() + "\n")
+        failed = [stack for stack in self.stacks if self.status.get(stack) == DELETE_FAILED]
+        if failed:
+            logger.info("Stacks stuck in {}: {}".format(DELETE_FAILED, ", ".join(failed)))
+        return [stack for stack in self.stacks if self.status.get(stack) not in [DELETE_COMPLETE, NOT_FOUND]]
+
+
+def remove_stacks(stacks, role_arn=None):
+    if Teardown(stacks, role_arn).remove():
+        sys.exit(1)
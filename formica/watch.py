@@ -0,0 +1,237 @@
+import copy
+import ctypes
+import ctypes.util
+import difflib
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+from . import file_index
+from .loader import Loader
+
+logger = logging.getLogger(__name__)
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+# Time to wait for further events after a change, so saving many files triggers a single render
+DEBOUNCE = 0.1
+POLL_INTERVAL = 0.5
+IGNORED_DIRECTORIES = [".git", ".hg", ".svn", "node_modules", ".venv", ".tox", "__pycache__"]
+
+
+def relative(path):
+    return os.path.normpath(os.path.relpath(path))
+
+
+def project_paths(index):
+    """All files of the project tree together with the directories containing them"""
+    paths = {"."}
+    for file in index.files():
+        paths.add(file)
+        parent = os.path.dirname(file)
+        while parent and parent not in paths:
+            paths.add(parent)
+            parent = os.path.dirname(parent)
+    return paths
+
+
+def watched_directories(dependencies):
+    """The directories of the project tree plus the directories of dependencies outside of it
+
+    Version control and package directories are left out of the tree, they can hold many directories that templates
+    don't use. Directories of dependencies inside of them are still watched.
+    """
+    index = file_index.FileIndex(file_index.ignore + IGNORED_DIRECTORIES)
+    directories = {path for path in project_paths(index) if os.path.isdir(path)}
+    directories.update(os.path.dirname(dependency) or "." for dependency in dependencies)
+    return sorted(d for d in directories if os.path.isdir(d))
+
+
+class Inotify(object):
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watches = {}
+        self.paths = set()
+
+    def add(self, path):
+        if path in self.paths:
+            return
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.watches[wd] = path
+            self.paths.add(path)
+
+    def update(self, directories):
+        for directory in directories:
+            self.add(directory)
+
+    def read(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        data = os.read(self.fd, 65536)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size : offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            path = relative(os.path.join(directory, os.fsdecode(name))) if name else directory
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self.add(path)
+            changed.add(path)
+        return changed
+
+    def changes(self):
+        changed = self.read(None)
+        while True:
+            more = self.read(DEBOUNCE)
+            if not more:
+                return changed
+            changed.update(more)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Poller(object):
+    """Fallback for systems without inotify that compares modification times"""
+
+    def __init__(self):
+        self.directories = []
+        self.state = {}
+
+    def update(self, directories):
+        self.directories = directories
+        self.state = self.scan()
+
+    def scan(self):
+        state = {}
+        for directory in self.directories:
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            state[relative(entry.path)] = entry.stat().st_mtime_ns
+                        except OSError:
+                            pass
+            except OSError:
+                pass
+        return state
+
+    def changes(self):
+        while True:
+            time.sleep(POLL_INTERVAL)
+            state = self.scan()
+            changed = {path for path in set(state) | set(self.state) if state.get(path) != self.state.get(path)}
+            self.state = state
+            if changed:
+                return changed
+
+    def close(self):
+        pass
+
+
+def watcher():
+    if sys.platform.startswith("linux"):
+        try:
+            return Inotify()
+        except (OSError, AttributeError):
+            pass
+    return Poller()
+
+
+class TemplateWatcher(object):
+    """Renders the template and re-renders only the template files whose dependencies changed"""
+
+    def __init__(self, variables=None):
+        self.variables = variables or {}
+        self.parts = {}
+        self.paths = set()
+
+    def outdated(self, part, changed, added_or_removed):
+        if changed is None:
+            return True
+        if part.dependencies & changed:
+            return True
+        # Listed directories only matter when files are added or removed, e.g. a new module template
+        return any((os.path.dirname(path) or ".") in part.directories for path in added_or_removed)
+
+    def render(self, changed=None):
+        loader = Loader(variables=self.variables)
+        added_or_removed = {path for path in changed or () if os.path.exists(path) != (path in self.paths)}
+        self.paths = project_paths(loader.index)
+        files = loader.template_files()
+        if not files:
+            logger.info("Could not find any template files in {}".format(loader.path))
+            sys.exit(1)
+        parts = {}
+        for file in files:
+            part = self.parts.get(file)
+            if part is None or self.outdated(part, changed, added_or_removed):
+                part = Loader(variables=self.variables, modules=loader.modules, index=loader.index)
+                template, errors = part.parse_template(file)
+                if errors:
+                    for error in errors:
+                        logger.info(error)
+                    sys.exit(1)
+                part.merge(template, file)
+            parts[file] = part
+            loader.dependencies.update(part.dependencies)
+            loader.directories.update(part.directories)
+            loader.merge(copy.deepcopy(part.cftemplate), file)
+        self.parts = parts
+        return loader
+
+    def dependencies(self):
+        return set().union(*[part.dependencies for part in self.parts.values()])
+
+
+def watch(variables, output, diff=False):
+    template_watcher = TemplateWatcher(variables)
+    changes = watcher()
+    previous = None
+    changed = None
+    try:
+        while True:
+            try:
+                current = output(template_watcher.render(changed))
+                if diff and previous is not None:
+                    lines = difflib.unified_diff(
+                        previous.splitlines(), current.splitlines(), "before", "after", lineterm=""
+                    )
+                    logger.info("\n".join(lines) or "No changes")
+                else:
+                    logger.info(current)
+                previous = current
+            except SystemExit as e:
+                if not e.code:
+                    raise
+                # Keep watching after template errors, a fixed template is rendered on the next change
+                template_watcher.parts = {}
+            changes.update(watched_directories(template_watcher.dependencies()))
+            logger.info("Watching for changes ...")
+            changed = changes.changes()
+    finally:
+        changes.close()
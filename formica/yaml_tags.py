@@ -3,7 +3,26 @@ from yaml.nodes import SequenceNode, ScalarNode, MappingNode, CollectionNode
 from yaml.resolver import BaseResolver
 
 
+class PythonTemplateLoader(yaml.FullLoader):
+    pass
+
+
+if yaml.__with_libyaml__:
+
+    class TemplateLoader(yaml.CFullLoader):
+        pass
+
+else:
+    TemplateLoader = PythonTemplateLoader
+
+
+def load(stream, loader=TemplateLoader):
+    return yaml.load(stream, Loader=loader)
+
+
 class BaseFunction(yaml.YAMLObject):
+    yaml_loader = list({yaml.Loader, yaml.FullLoader, yaml.UnsafeLoader, PythonTemplateLoader, TemplateLoader})
+
     @classmethod
     def tag(self, node):
         return node.lstrip("!")
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+import yaml
+
+from formica import yaml_tags
+
+RESOURCE = """  Bucket{index}:
+    Type: AWS::S3::Bucket
+    Condition: !Condition IsProduction
+    Properties:
+      BucketName: !Sub "${{AWS::StackName}}-bucket-{index}"
+      Tags:
+        - Key: Name
+          Value: !Join ["-", [!Ref AWS::StackName, !Select [0, !Split [".", !GetAtt Domain{index}.Name]]]]
+        - Key: Zone
+          Value: !Select [0, !GetAZs ""]
+        - Key: Encoded
+          Value: !Base64 "bucket-{index}"
+        - Key: Subnet
+          Value: !Select [0, !Cidr ["10.0.0.0/16", 4, 8]]
+      LoggingConfiguration:
+        DestinationBucketName: !If
+          - IsProduction
+          - !ImportValue LoggingBucket
+          - !FindInMap [Buckets, !Ref "AWS::Region", Logging]
+        Enabled: !And [!Equals [!Ref Env, prod], !Not [!Or [!Equals [a, b], !Equals [c, d]]]]
+"""
+
+
+@pytest.fixture(scope='module')
+def template():
+    return "Resources:\n" + "".join(RESOURCE.format(index=index) for index in range(4000))
+
+
+def measure(template, loader):
+    start = time.perf_counter()
+    result = yaml_tags.load(template, loader=loader)
+    return result, time.perf_counter() - start
+
+
+@pytest.mark.skipif(not yaml.__with_libyaml__, reason='libyaml is not available')
+def test_libyaml_parsing_of_large_template(template):
+    python_result, python_time = measure(template, yaml_tags.PythonTemplateLoader)
+    libyaml_result, libyaml_time = measure(template, yaml_tags.TemplateLoader)
+    print('\nParsing {:.1f}MB template: python {:.2f}s, libyaml {:.2f}s ({:.1f}x)'.format(
+        len(template) / 1024 / 1024, python_time, libyaml_time, python_time / libyaml_time))
+    assert libyaml_result == python_result
+    assert libyaml_time < python_time
@@ -1,5 +1,42 @@
 import pytest
 
+from formica import aws, cache, polling, rate_limit
+
+
+@pytest.fixture(autouse=True)
+def cache_directory(mocker, tmpdir_factory):
+    directory = str(tmpdir_factory.mktemp('cache'))
+    mocker.patch.object(cache, 'DEFAULT_DIRECTORY', directory)
+    mocker.patch.object(cache, 'directory', None)
+    mocker.patch.object(cache, 'max_size', 0)
+    return directory
+
+
+@pytest.fixture(autouse=True)
+def sleep(mocker):
+    mocker.patch.object(polling, 'initial_delay', None)
+    mocker.patch.object(polling, 'max_delay', None)
+    return mocker.patch('formica.polling.time').sleep
+
+
+@pytest.fixture(autouse=True)
+def aws_clients(mocker):
+    mocker.patch.object(aws, 'config', None)
+    mocker.patch.object(aws, '_session_key', None)
+    mocker.patch.object(aws, '_client_options', None)
+    mocker.patch.object(aws, 'identity_cache_ttl', 0)
+    mocker.patch.object(aws, 'organization_cache_ttl', 0)
+    mocker.patch.object(aws, 'refresh_organization_cache', False)
+    mocker.patch.object(aws, 'region_source', 'api')
+    mocker.patch.object(aws, 'partition', None)
+    mocker.patch.object(aws, 'opted_in_regions', False)
+    mocker.patch.object(aws, 'retry_mode_set', None)
+    mocker.patch.object(rate_limit, 'rates', dict(rate_limit.DEFAULT_RATES))
+    rate_limit.reset()
+    aws.reset()
+    yield
+    aws.reset()
+
 
 @pytest.fixture
 def botocore_session(mocker):
@@ -13,7 +50,7 @@ def session(botocore_session):
 
 @pytest.fixture
 def boto_client(mocker):
-    mocker.patch('formica.aws.boto3')
+    mocker.patch('boto3.setup_default_session')
     mocker.patch('formica.aws.botocore')
     return mocker.patch('boto3.client')
 
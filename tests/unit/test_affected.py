@@ -0,0 +1,107 @@
+import io
+import os
+
+import pytest
+from path import Path
+
+from formica import cli
+from formica.affected import affected_config_files
+
+
+def write(name, content):
+    os.makedirs(os.path.dirname(name) or '.', exist_ok=True)
+    with open(name, 'w') as f:
+        f.write(content)
+
+
+@pytest.fixture
+def monorepo(tmpdir):
+    with Path(tmpdir):
+        write('modules/bucket/bucket.template.json', '{"Resources": {"Bucket": {"Type": "AWS::S3::Bucket"}}}')
+        write('first/stack.config.yaml', 'stack: first-stack\nvars:\n  Name: first')
+        write('first/stack.template.json', '{"Description": "{{ code(\'code.py\') }}"}')
+        write('first/code.py', 'print("{{ Name }}")')
+        write('second/stack.config.yaml', 'stack: second-stack')
+        write(
+            'second/stack.template.json',
+            '{"Resources": {"Bucket": {"From": "Bucket"}}, "Description": "{{ file(\'shared.txt\') }}"}',
+        )
+        write('shared.txt', 'shared')
+        # Stacks share modules and files through symlinks
+        os.symlink('../modules/bucket', 'second/bucket')
+        os.symlink('../shared.txt', 'second/shared.txt')
+        write('README.md', '')
+        yield tmpdir
+
+
+CONFIG_FILES = ['first/stack.config.yaml', 'second/stack.config.yaml']
+
+
+@pytest.mark.parametrize(
+    'changed,affected',
+    [
+        (['first/code.py'], ['first/stack.config.yaml']),
+        (['first/stack.config.yaml'], ['first/stack.config.yaml']),
+        (['modules/bucket/bucket.template.json'], ['second/stack.config.yaml']),
+        (['shared.txt', 'first/stack.template.json'], CONFIG_FILES),
+        (['README.md', 'modules/other.txt'], []),
+        ([], []),
+    ],
+)
+def test_affected_config_files(monorepo, changed, affected):
+    assert affected_config_files(CONFIG_FILES, changed) == affected
+
+
+def test_new_template_file_affects_stack(monorepo):
+    with Path(monorepo):
+        assert affected_config_files(CONFIG_FILES, ['second/new.template.yml']) == ['second/stack.config.yaml']
+
+
+def test_renders_in_config_file_directory(monorepo):
+    with Path(monorepo):
+        affected_config_files(CONFIG_FILES, [])
+        assert os.getcwd() == str(monorepo)
+
+
+def test_stacks_needing_aws_are_always_affected(monorepo):
+    with Path(monorepo):
+        write('third/stack.config.yaml', 'organization_variables: true')
+        write('third/stack.template.json', '{}')
+        assert affected_config_files(['third/stack.config.yaml'], ['README.md']) == ['third/stack.config.yaml']
+
+
+def test_failing_stacks_are_always_affected(monorepo):
+    with Path(monorepo):
+        write('third/stack.config.yaml', 'stack: third')
+        write('third/stack.template.json', '{"Description": "{{ Missing | mandatory }}"}')
+        assert affected_config_files(['third/stack.config.yaml'], []) == ['third/stack.config.yaml']
+
+
+def test_artifacts_are_dependencies(monorepo):
+    with Path(monorepo):
+        write('third/stack.config.yaml', 'artifacts:\n  - lambda.zip')
+        write('third/lambda.zip', '')
+        write('third/stack.template.json', '{"Description": "{{ artifacts[\'lambda.zip\'].bucket }}"}')
+        assert affected_config_files(['third/stack.config.yaml'], ['third/lambda.zip']) == ['third/stack.config.yaml']
+
+
+def test_files_function_depends_on_whole_tree(monorepo):
+    with Path(monorepo):
+        write('third/stack.config.yaml', 'stack: third')
+        write('third/stack.template.json', '{"Description": "{{ files(\'lambda/*\') | join(\',\') }}"}')
+        assert affected_config_files(['third/stack.config.yaml'], ['third/lambda/nested/new.py']) == [
+            'third/stack.config.yaml'
+        ]
+
+
+def test_affected_command(monorepo, logger):
+    with Path(monorepo):
+        cli.main(['affected'] + CONFIG_FILES + ['--changed-files', 'first/code.py'])
+    logger.info.assert_called_once_with('first/stack.config.yaml')
+
+
+def test_affected_command_reads_stdin_and_prints_stacks(monorepo, logger, mocker):
+    mocker.patch('sys.stdin', io.StringIO('shared.txt\n\nREADME.md\n'))
+    with Path(monorepo):
+        cli.main(['affected', '--stacks'] + CONFIG_FILES)
+    logger.info.assert_called_once_with('second-stack')
@@ -1,6 +1,7 @@
+import mock
 import pytest
 
-from formica import aws
+from formica import aws, cache
 from tests.unit.constants import REGION, PROFILE
 
 
@@ -19,3 +20,113 @@ def test_init_without_parameters(boto, session, botocore_session, mocker):
     botocore_session.assert_called_with(profile=profile)
 
     boto.setup_default_session.assert_called_with(botocore_session=session_mock, region_name=region, profile_name=profile)
+
+
+def test_clients_are_shared(boto_client):
+    assert aws.client('cloudformation') is aws.client('cloudformation')
+    aws.client('cloudformation', region='eu-central-1')
+    aws.client('sts')
+    assert boto_client.call_count == 3
+    boto_client.assert_any_call('cloudformation', config=mock.ANY)
+    boto_client.assert_any_call('cloudformation', region_name='eu-central-1', config=mock.ANY)
+    boto_client.assert_any_call('sts')
+
+
+def test_clients_are_created_per_session(boto_client, mocker):
+    aws.client('cloudformation')
+    mocker.patch('boto3.DEFAULT_SESSION', mocker.Mock())
+    aws.client('cloudformation')
+    assert boto_client.call_count == 2
+
+
+def test_resources_are_shared(boto_resource):
+    assert aws.resource('s3') is aws.resource('s3')
+    boto_resource.assert_called_once_with('s3')
+
+
+def test_configure_sets_pool_size_and_retry_mode(boto_client):
+    aws.configure(max_pool_connections=50, retry_mode='adaptive')
+    aws.client('cloudformation')
+    config = boto_client.call_args[1]['config']
+    assert config.max_pool_connections == 50
+    assert config.retries == {'mode': 'adaptive'}
+
+
+def test_initialize_resets_clients(botocore_session, boto_client):
+    aws.client('cloudformation')
+    aws.initialize(REGION, PROFILE, max_pool_connections=20)
+    aws.client('cloudformation')
+    assert boto_client.call_count == 2
+    assert boto_client.call_args[1]['config'].max_pool_connections == 20
+
+
+def test_caller_identity_is_fetched_once(aws_client):
+    aws_client.get_caller_identity.return_value = {'Account': '1234', 'Arn': 'arn', 'UserId': 'user'}
+    assert aws.caller_identity()['Account'] == '1234'
+    assert aws.caller_identity()['Account'] == '1234'
+    aws_client.get_caller_identity.assert_called_once()
+
+
+def test_caller_identity_is_cached_on_disk(aws_client, mocker):
+    credentials = mocker.Mock(access_key='AKIA')
+    mocker.patch('boto3.DEFAULT_SESSION').get_credentials.return_value = credentials
+    aws_client.meta.region_name = 'eu-central-1'
+    aws_client.get_caller_identity.return_value = {'Account': '1234'}
+    cache.initialize()
+    aws.configure(identity_ttl=60)
+    aws.caller_identity()
+    aws.reset()
+    assert aws.caller_identity() == {'Account': '1234'}
+    aws_client.get_caller_identity.assert_called_once()
+
+    credentials.access_key = 'OTHER'
+    aws.reset()
+    aws.caller_identity()
+    assert aws_client.get_caller_identity.call_count == 2
+
+
+def test_caller_identity_disk_cache_expires(aws_client, mocker):
+    mocker.patch('boto3.DEFAULT_SESSION').get_credentials.return_value = mocker.Mock(access_key='AKIA')
+    aws_client.meta.region_name = 'eu-central-1'
+    aws_client.get_caller_identity.return_value = {'Account': '1234'}
+    cache.initialize()
+    aws.configure(identity_ttl=60)
+    time = mocker.patch('formica.aws.time')
+    time.time.return_value = 1000
+    aws.caller_identity()
+    aws.reset()
+    time.time.return_value = 1061
+    aws.caller_identity()
+    assert aws_client.get_caller_identity.call_count == 2
+
+
+def test_organization_lookup_is_shared(aws_client, mocker):
+    fetch = mocker.Mock(return_value=['eu-central-1'])
+    assert aws.organization_lookup('regions', fetch) == ['eu-central-1']
+    assert aws.organization_lookup('regions', fetch) == ['eu-central-1']
+    fetch.assert_called_once()
+
+
+def test_organization_lookup_is_cached_on_disk(aws_client, mocker):
+    aws_client.meta.region_name = 'eu-central-1'
+    aws_client.get_caller_identity.return_value = {'Account': '1234'}
+    fetch = mocker.Mock(return_value=['eu-central-1'])
+    cache.initialize()
+    aws.configure(organization_ttl=60)
+    aws.organization_lookup('regions', fetch)
+    aws.reset()
+    assert aws.organization_lookup('regions', fetch) == ['eu-central-1']
+    fetch.assert_called_once()
+
+    aws.configure(organization_ttl=60, refresh_organization=True)
+    aws.reset()
+    aws.organization_lookup('regions', fetch)
+    assert fetch.call_count == 2
+
+
+def test_initialize_keeps_session_of_same_profile(boto, botocore_session):
+    aws.initialize(REGION, PROFILE)
+    aws.initialize(REGION, PROFILE, max_pool_connections=20)
+    assert boto.setup_default_session.call_count == 1
+    aws.initialize(REGION, 'other')
+    assert boto.setup_default_session.call_count == 2
@@ -0,0 +1,126 @@
+import json
+import os
+import sys
+
+import pytest
+from path import Path
+
+from formica import batch, cli
+
+
+def write(name, content):
+    os.makedirs(os.path.dirname(name) or '.', exist_ok=True)
+    with open(name, 'w') as f:
+        f.write(content)
+
+
+@pytest.fixture
+def stacks(tmpdir):
+    with Path(tmpdir):
+        write('stacks/first/stack.config.yaml', 'stack: first\nvars:\n  Name: first-bucket')
+        write('stacks/first/stack.template.json', '{"Description": "{{ Name }}"}')
+        write('stacks/second/stack.config.yaml', 'stack: second\nparameters:\n  A: B')
+        write('stacks/second/stack.template.json', '{"Description": "second"}')
+        write('stacks/.hidden/stack.config.yaml', 'stack: hidden')
+        yield tmpdir
+
+
+def test_config_files_searches_directories(stacks):
+    with Path(stacks):
+        write('other.config.yaml', 'stack: other')
+        files = batch.config_files(['stacks', 'other.config.yaml', 'stacks/first/stack.config.yaml'])
+    assert files == ['stacks/first/stack.config.yaml', 'stacks/second/stack.config.yaml', 'other.config.yaml']
+
+
+def test_batch_change_renders_every_stack_from_its_directory(stacks, change_set, aws_client, caplog):
+    with Path(stacks):
+        cli.main(['batch', 'change', 'stacks', '--concurrency', '2'])
+    templates = {
+        call[1]['template'] for call in change_set.return_value.create.call_args_list
+    }
+    assert {json.loads(template)['Description'] for template in templates} == {'first-bucket', 'second'}
+    change_set.assert_any_call(stack='first', nested_change_sets=False)
+    change_set.assert_any_call(stack='second', nested_change_sets=False)
+    assert 'Succeeded' in caplog.text
+
+
+def test_batch_continues_after_failing_stack(stacks, change_set, aws_client, caplog):
+    with Path(stacks):
+        write('stacks/broken/stack.config.yaml', 'stack: broken\nunknown-option: true')
+        with pytest.raises(SystemExit) as e:
+            cli.main(['batch', 'change', 'stacks'])
+    assert e.value.code == 1
+    assert change_set.return_value.create.call_count == 2
+    assert '1 of 3 stacks failed' in caplog.text
+
+
+def test_batch_deploy_runs_every_stack(stacks, mocker):
+    deploy = mocker.patch('formica.cli.deploy')
+    mocker.patch('formica.aws.initialize')
+    with Path(stacks):
+        cli.main(['batch', 'deploy', 'stacks'])
+    assert sorted(call[0][0].stack for call in deploy.call_args_list) == ['first', 'second']
+
+
+@pytest.fixture
+def dependent_stacks(tmpdir):
+    with Path(tmpdir):
+        write('network/stack.config.yaml', 'stack: network')
+        write(
+            'network/stack.template.yaml',
+            'Outputs:\n  Vpc:\n    Value: vpc\n    Export:\n      Name: !Sub "${AWS::StackName}-Vpc"',
+        )
+        write('app/stack.config.yaml', 'stack: app\nparameters:\n  Network: network')
+        write(
+            'app/stack.template.yaml',
+            'Resources:\n  Subnet:\n    Type: AWS::EC2::Subnet\n    Properties:\n'
+            '      VpcId: !ImportValue\n        Fn::Sub: "${Network}-Vpc"',
+        )
+        write('other/stack.config.yaml', 'stack: other')
+        write('other/stack.template.yaml', 'Description: other')
+        yield tmpdir
+
+
+def test_batch_waves_run_dependencies_first(dependent_stacks, mocker, caplog):
+    deploy = mocker.patch('formica.cli.deploy')
+    mocker.patch('formica.aws.initialize')
+    with Path(dependent_stacks):
+        cli.main(['batch', 'deploy', '.', '--waves'])
+    order = [call[0][0].stack for call in deploy.call_args_list]
+    assert order.index('network') < order.index('app')
+    assert 'Wave 1: network, other' in caplog.text
+    assert 'Wave 2: app' in caplog.text
+
+
+def test_batch_waves_skip_dependents_of_failed_stacks(dependent_stacks, mocker, caplog):
+    def fail_network(args):
+        if args.stack == 'network':
+            sys.exit(1)
+
+    deploy = mocker.patch('formica.cli.deploy', side_effect=fail_network)
+    mocker.patch('formica.aws.initialize')
+    with Path(dependent_stacks):
+        with pytest.raises(SystemExit):
+            cli.main(['batch', 'deploy', '.', '--waves'])
+    assert sorted(call[0][0].stack for call in deploy.call_args_list) == ['network', 'other']
+    assert 'Skipped: network did not succeed' in caplog.text
+
+
+def test_batch_waves_skip_importers_when_exporter_fails_to_prepare(dependent_stacks, mocker, caplog):
+    deploy = mocker.patch('formica.cli.deploy')
+    mocker.patch('formica.aws.initialize')
+    with Path(dependent_stacks):
+        write('network/stack.template.yaml', 'Outputs: {{ missing }')
+        with pytest.raises(SystemExit):
+            cli.main(['batch', 'deploy', '.', '--waves'])
+    assert [call[0][0].stack for call in deploy.call_args_list] == ['other']
+    assert 'Skipped: network failed before its exports were known' in caplog.text
+
+
+def test_batch_waves_remove_dependents_first(dependent_stacks, mocker):
+    remove = mocker.patch('formica.cli.remove')
+    mocker.patch('formica.aws.initialize')
+    with Path(dependent_stacks):
+        cli.main(['batch', 'remove', '.', '--waves'])
+    order = [call[0][0].stack for call in remove.call_args_list]
+    assert order.index('app') < order.index('network')
@@ -2,8 +2,9 @@ import pytest
 from mock import Mock
 import json
 import copy
+import threading
 
-from botocore.exceptions import WaiterError, ClientError
+from botocore.exceptions import ClientError
 
 from formica.change_set import ChangeSet, CHANGE_SET_HEADER
 from tests.unit.constants import (
@@ -31,9 +32,8 @@ def logger(mocker):
 
 @pytest.fixture
 def client(mocker):
-    s3_boto = mocker.patch('formica.s3.boto3')
-    boto = mocker.patch('formica.change_set.boto3')
-    client = mocker.patch('formica.change_set.cf')
+    client = mocker.patch('boto3.client').return_value
+    client.describe_change_set.return_value = {'Status': 'CREATE_COMPLETE', 'Changes': []}
     return client
 
 
@@ -65,10 +65,7 @@ def test_submits_changeset_and_waits(client):
         StackName=STACK, TemplateBody=TEMPLATE,
         ChangeSetName=CHANGESETNAME, ChangeSetType=CHANGE_SET_TYPE, IncludeNestedStacks=False)
 
-    client.get_waiter.assert_called_with(
-        'change_set_create_complete')
-    client.get_waiter.return_value.wait.assert_called_with(
-        StackName=STACK, ChangeSetName=CHANGESETNAME, WaiterConfig={'Delay': 10, 'MaxAttempts': 120})
+    client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME)
 
 
 def test_creates_and_removes_bucket_for_s3_flag(client, temp_bucket_function, temp_bucket):
@@ -103,10 +100,7 @@ def test_submits_changeset_with_parameters(client):
         StackName=STACK, TemplateBody=TEMPLATE,
         ChangeSetName=CHANGESETNAME, ChangeSetType=CHANGE_SET_TYPE, Parameters=Parameters, IncludeNestedStacks=False)
 
-    client.get_waiter.assert_called_with(
-        'change_set_create_complete')
-    client.get_waiter.return_value.wait.assert_called_with(
-        StackName=STACK, ChangeSetName=CHANGESETNAME, WaiterConfig={'Delay': 10, 'MaxAttempts': 120})
+    client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME)
 
 
 def test_submits_changeset_with_stack_tags(client):
@@ -122,10 +116,7 @@ def test_submits_changeset_with_stack_tags(client):
         StackName=STACK, TemplateBody=TEMPLATE,
         ChangeSetName=CHANGESETNAME, ChangeSetType=CHANGE_SET_TYPE, Tags=Tags, IncludeNestedStacks=False)
 
-    client.get_waiter.assert_called_with(
-        'change_set_create_complete')
-    client.get_waiter.return_value.wait.assert_called_with(
-        StackName=STACK, ChangeSetName=CHANGESETNAME, WaiterConfig={'Delay': 10, 'MaxAttempts': 120})
+    client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME)
 
 
 def test_submits_changeset_with_role_arn(client):
@@ -137,10 +128,7 @@ def test_submits_changeset_with_role_arn(client):
         StackName=STACK, TemplateBody=TEMPLATE,
         ChangeSetName=CHANGESETNAME, ChangeSetType=CHANGE_SET_TYPE, RoleARN=ROLE_ARN, IncludeNestedStacks=False)
 
-    client.get_waiter.assert_called_with(
-        'change_set_create_complete')
-    client.get_waiter.return_value.wait.assert_called_with(
-        StackName=STACK, ChangeSetName=CHANGESETNAME, WaiterConfig={'Delay': 10, 'MaxAttempts': 120})
+    client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME)
 
 
 def test_submits_changeset_with_capabilities(client):
@@ -153,10 +141,7 @@ def test_submits_changeset_with_capabilities(client):
         StackName=STACK, TemplateBody=TEMPLATE,
         ChangeSetName=CHANGESETNAME, ChangeSetType=CHANGE_SET_TYPE, Capabilities=['A', 'B'], IncludeNestedStacks=False)
 
-    client.get_waiter.assert_called_with(
-        'change_set_create_complete')
-    client.get_waiter.return_value.wait.assert_called_with(
-        StackName=STACK, ChangeSetName=CHANGESETNAME, WaiterConfig={'Delay': 10, 'MaxAttempts': 120})
+    client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME)
 
 
 def test_change_set_with_nested_stacks(client):
@@ -168,17 +153,20 @@ def test_change_set_with_nested_stacks(client):
         StackName=STACK, TemplateBody=TEMPLATE,
         ChangeSetName=CHANGESETNAME, ChangeSetType=CHANGE_SET_TYPE, IncludeNestedStacks=True)
 
-    client.get_waiter.assert_called_with(
-        'change_set_create_complete')
-    client.get_waiter.return_value.wait.assert_called_with(
-        StackName=STACK, ChangeSetName=CHANGESETNAME, WaiterConfig={'Delay': 10, 'MaxAttempts': 120})
+    client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME)
+
+
+def test_polls_until_change_set_is_created(client, sleep):
+    client.describe_change_set.side_effect = [
+        {'Status': 'CREATE_PENDING'}, {'Status': 'CREATE_IN_PROGRESS'}, {'Status': 'CREATE_COMPLETE'}]
+    ChangeSet(STACK).create(template=TEMPLATE, change_set_type=CHANGE_SET_TYPE)
+    assert client.describe_change_set.call_count == 3
+    assert sleep.call_count == 3
 
 
 def test_prints_error_message_for_failed_submit_and_exits(capsys, logger, client):
     change_set = ChangeSet(STACK)
-
-    error = WaiterError('name', 'reason', {'StatusReason': 'StatusReason'})
-    client.get_waiter.return_value.wait.side_effect = error
+    client.describe_change_set.return_value = {'Status': 'FAILED', 'StatusReason': 'StatusReason'}
 
     with pytest.raises(SystemExit) as pytest_wrapped_e:
         change_set.create(template=TEMPLATE, change_set_type=CHANGE_SET_TYPE)
@@ -188,9 +176,7 @@ def test_prints_error_message_for_failed_submit_and_exits(capsys, logger, client
 
 def test_prints_error_message_and_does_not_fail_without_StatusReason(capsys, logger, client):
     change_set = ChangeSet(STACK)
-
-    error = WaiterError('name', 'reason', {})
-    client.get_waiter.return_value.wait.side_effect = error
+    client.describe_change_set.return_value = {'Status': 'FAILED'}
 
     with pytest.raises(SystemExit) as pytest_wrapped_e:
         change_set.create(template=TEMPLATE, change_set_type=CHANGE_SET_TYPE)
@@ -198,13 +184,27 @@ def test_prints_error_message_and_does_not_fail_without_StatusReason(capsys, log
     assert pytest_wrapped_e.value.code == 1
 
 
+def test_stops_polling_on_any_final_status(logger, client):
+    client.describe_change_set.return_value = {'Status': 'DELETE_COMPLETE'}
+    with pytest.raises(SystemExit):
+        ChangeSet(STACK).create(template=TEMPLATE, change_set_type=CHANGE_SET_TYPE)
+    assert client.describe_change_set.call_count == 1
+
+
+def test_exits_when_change_set_disappears(logger, client):
+    client.describe_change_set.side_effect = ClientError(
+        dict(Error=dict(Code='ChangeSetNotFound', Message='ChangeSet does not exist')), 'DescribeChangeSet')
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        ChangeSet(STACK).create(template=TEMPLATE, change_set_type=CHANGE_SET_TYPE)
+    assert pytest_wrapped_e.value.code == 1
+    logger.info.assert_called_with('ChangeSet does not exist')
+
+
 def test_prints_error_message_but_exits_successfully_for_no_changes(capsys, logger, mocker, client):
     change_set = ChangeSet(STACK)
     status_reason = "The submitted information didn't contain changes. " \
                     "Submit different information to create a change set."
-
-    error = WaiterError('name', 'reason', {'StatusReason': status_reason})
-    client.get_waiter.return_value.wait.side_effect = error
+    client.describe_change_set.return_value = {'Status': 'FAILED', 'StatusReason': status_reason}
 
     change_set.create(template=TEMPLATE, change_set_type=CHANGE_SET_TYPE)
     logger.info.assert_called_with(status_reason)
@@ -214,7 +214,7 @@ def test_remove_existing_changeset_for_update_type(mocker, capsys, client, chang
     mocker.patch.object(ChangeSet, 'describe')
     change_set = ChangeSet(STACK)
     client.describe_change_set.side_effect = [
-        {"ChangeSetId": CHANGESETNAME}, {}, change_set_not_found]
+        {"ChangeSetId": CHANGESETNAME}, {}, change_set_not_found, {'Status': 'CREATE_COMPLETE'}]
     change_set.create(template=TEMPLATE, change_set_type='UPDATE')
     client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME)
     client.delete_change_set.assert_called_with(ChangeSetName=CHANGESETNAME)
@@ -304,6 +304,74 @@ def test_prints_nested_changes(logger, client):
     change_set.describe()
 
 
+def nested_change(logical_id, arn):
+    return {'ResourceChange': {'Action': 'Modify', 'LogicalResourceId': logical_id, 'PhysicalResourceId': logical_id,
+                               'ResourceType': 'AWS::CloudFormation::Stack', 'ChangeSetId': arn, 'Details': []}}
+
+
+def test_fetches_nested_changes_concurrently_and_prints_in_order(logger, client):
+    second_described = threading.Event()
+    descriptions = {
+        'first': {'Changes': [nested_change('FirstChild', 'first-child')]},
+        'first-child': {'Changes': []},
+        'second': {'Changes': []},
+    }
+
+    def describe_change_set(ChangeSetName, **kwargs):
+        if ChangeSetName == CHANGESETNAME:
+            return {'Changes': [nested_change('First', 'first'), nested_change('Second', 'second')]}
+        if ChangeSetName == 'first':
+            # Only returns once the second nested change set was described at the same time
+            assert second_described.wait(5)
+        if ChangeSetName == 'second':
+            second_described.set()
+        return descriptions[ChangeSetName]
+
+    client.describe_change_set.side_effect = describe_change_set
+    ChangeSet(STACK).describe()
+
+    nested = [call[1][0] for call in logger.info.mock_calls if 'Changes for nested Stack' in call[1][0]]
+    assert nested == ['\nChanges for nested Stack: First', '\nChanges for nested Stack: FirstChild',
+                      '\nChanges for nested Stack: Second']
+
+
+def resource_change(logical_id, action='Modify', replacement=''):
+    return {'ResourceChange': {'Action': action, 'LogicalResourceId': logical_id, 'ResourceType': 'AWS::S3::Bucket',
+                               'Replacement': replacement, 'Details': []}}
+
+
+def test_prints_changes_of_every_page(logger, client):
+    client.describe_change_set.side_effect = [
+        {'Changes': [resource_change('FirstPage')], 'NextToken': 'token'},
+        {'Changes': [resource_change('SecondPage')]},
+    ]
+    ChangeSet(STACK).describe(print_metadata=False)
+
+    client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME, NextToken='token')
+    output = [call[1][0] for call in logger.info.mock_calls]
+    # The header and every page are printed separately as they are described
+    assert 'Action' in output[0]
+    assert 'FirstPage' in output[1]
+    assert 'SecondPage' in output[2]
+
+
+def test_filters_printed_changes(logger, client):
+    client.describe_change_set.return_value = {'Changes': [
+        resource_change('Replaced', replacement='True'),
+        resource_change('MaybeReplaced', replacement='Conditional'),
+        resource_change('Removed', action='Remove'),
+        resource_change('Modified', replacement='False'),
+    ]}
+    ChangeSet(STACK).describe(print_metadata=False, only_replacements=True)
+    output = logger.info.call_args[0][0]
+    assert 'Replaced' in output and 'MaybeReplaced' in output
+    assert 'Removed' not in output and 'Modified' not in output
+
+    ChangeSet(STACK).describe(print_metadata=False, actions=['Remove'])
+    assert 'Removed' in logger.info.call_args[0][0]
+    assert 'Replaced' not in logger.info.call_args[0][0]
+
+
 def test_only_prints_unique_changed_parameters(logger, client):
     client.describe_change_set.return_value = CHANGESETCHANGES_WITH_DUPLICATE_CHANGED_PARAMETER
     change_set = ChangeSet(STACK)
@@ -0,0 +1,37 @@
+from formica import dependencies
+from formica.dependencies import Context
+
+
+def test_resolve_substitutes_pseudo_parameters_and_parameters():
+    context = Context('network', 'eu-central-1', {'Env': 'prod'}, {'Parameters': {'Name': {'Default': 'vpc'}}})
+    assert dependencies.resolve({'Fn::Sub': '${AWS::StackName}-${Name}-${Env}'}, context) == 'network-vpc-prod'
+    assert dependencies.resolve({'Fn::Sub': ['${Prefix}-${AWS::Region}', {'Prefix': 'a'}]}, context) == 'a-eu-central-1'
+    assert dependencies.resolve({'Fn::Join': ['-', [{'Ref': 'AWS::StackName'}, 'Vpc']]}, context) == 'network-Vpc'
+    assert dependencies.resolve({'Fn::Sub': '${Unknown}-Vpc'}, context) is None
+    assert dependencies.resolve({'Fn::GetAtt': ['Vpc', 'Id']}, context) is None
+
+
+def test_exports_and_imports_of_template():
+    template = {
+        'Resources': {
+            'Subnet': {'Properties': {'VpcId': {'Fn::ImportValue': {'Fn::Sub': '${Network}-Vpc'}}}},
+            'Topic': {'Properties': {'Name': {'Fn::ImportValue': 'shared-topic'}}},
+        },
+        'Outputs': {'Subnet': {'Value': {'Ref': 'Subnet'}, 'Export': {'Name': {'Fn::Sub': '${AWS::StackName}-Subnet'}}}},
+    }
+    context = Context('app', parameters={'Network': 'network'})
+    assert dependencies.exports(template, context) == {'app-Subnet'}
+    assert dependencies.imports(template, context) == {'network-Vpc', 'shared-topic'}
+
+
+def test_waves_of_dependency_graph():
+    graph = dependencies.dependency_graph(
+        {'network': {'network-Vpc'}, 'app': {'app-Subnet'}, 'dns': set()},
+        {'network': set(), 'app': {'network-Vpc', 'outside'}, 'dns': {'app-Subnet', 'network-Vpc'}},
+    )
+    assert graph == {'network': set(), 'app': {'network'}, 'dns': {'app', 'network'}}
+    assert dependencies.waves(graph) == ([['network'], ['app'], ['dns']], [])
+
+
+def test_waves_return_stacks_of_cycles():
+    assert dependencies.waves({'a': {'b'}, 'b': {'a'}, 'c': set()}) == ([['c']], ['a', 'b'])
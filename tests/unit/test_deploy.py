@@ -1,5 +1,5 @@
 import pytest
-from mock import Mock
+from mock import ANY, Mock
 
 from botocore.exceptions import NoCredentialsError
 
@@ -36,7 +36,7 @@ def test_executes_change_set_and_waits(session, stack_waiter, client, boto_clien
     client.describe_stacks.return_value = {'Stacks': [{'StackId': STACK_ID}]}
 
     cli.main(['deploy', '--stack', STACK, '--profile', PROFILE, '--region', REGION])
-    boto_client.assert_called_with('cloudformation')
+    boto_client.assert_called_with('cloudformation', config=ANY)
     client.describe_stack_events.assert_called_with(StackName=STACK)
     client.execute_change_set.assert_called_with(ChangeSetName=CHANGESETNAME, StackName=STACK)
     client.describe_change_set.assert_called_with(ChangeSetName=CHANGESETNAME, StackName=STACK)
@@ -9,3 +9,8 @@ def test_describes_change_set(boto_client, change_set):
     cli.main(['describe', '--stack', STACK])
     change_set.assert_called_with(stack=STACK)
     change_set.return_value.describe.assert_called_once()
+
+
+def test_describes_change_set_with_filters(boto_client, change_set):
+    cli.main(['describe', '--stack', STACK, '--only-replacements', '--action', 'Remove', 'Modify'])
+    change_set.return_value.describe.assert_called_once_with(actions=['Remove', 'Modify'], only_replacements=True)
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+from path import Path
+
+from formica.file_index import FileIndex
+
+
+@pytest.fixture
+def index():
+    return FileIndex()
+
+
+def test_lists_every_directory_once(index, tmpdir, mocker):
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        with open('test.template.json', 'w') as f:
+            f.write('')
+        scandir = mocker.spy(os, 'scandir')
+        assert sorted(index.listdir('.')) == ['moduledir', 'test.template.json']
+        assert index.listdir('./') == index.listdir('.')
+        assert index.isdir('moduledir')
+        assert not index.isdir('./test.template.json')
+    assert scandir.call_count == 1
+
+
+def test_matches_case_insensitive(index, tmpdir):
+    with Path(tmpdir):
+        with open('TesT.template.json', 'w') as f:
+            f.write('')
+        with open('other.template.yml', 'w') as f:
+            f.write('')
+        assert index.match('.', 'test.template.json') == ['TesT.template.json']
+        assert index.match('.', '*.template.json') == ['TesT.template.json']
+
+
+def test_isdir_for_missing_parent(index, tmpdir):
+    with Path(tmpdir):
+        assert not index.isdir('missing/moduledir')
+
+
+def test_listdir_fails_for_missing_directory(index, tmpdir):
+    with Path(tmpdir):
+        with pytest.raises(OSError):
+            index.listdir('missing')
+
+
+def test_files_lists_tree_like_jinja(index, tmpdir):
+    from jinja2 import FileSystemLoader
+    with Path(tmpdir):
+        os.makedirs('moduledir/nested')
+        for name in ['test.template.json', 'moduledir/a.py', 'moduledir/nested/b.py']:
+            with open(name, 'w') as f:
+                f.write('')
+        assert index.files() == FileSystemLoader('./', followlinks=True).list_templates()
+        assert index.glob('moduledir/*') == ['moduledir/a.py', 'moduledir/nested/b.py']
+
+
+def test_files_skips_ignored_directories(tmpdir, mocker):
+    index = FileIndex(ignore_patterns=['node_modules', 'build/*'])
+    with Path(tmpdir):
+        os.makedirs('lambdas/node_modules/dep')
+        os.makedirs('build/output')
+        for name in ['lambdas/a.py', 'lambdas/node_modules/dep/index.js', 'build/output/x.py', 'build.py']:
+            with open(name, 'w') as f:
+                f.write('')
+        assert index.files() == ['build.py', 'lambdas/a.py']
+        assert index.directories() == ['.', 'build', 'lambdas']
+
+
+def test_files_walks_tree_once(index, tmpdir, mocker):
+    with Path(tmpdir):
+        walk = mocker.spy(os, 'walk')
+        index.glob('*.py')
+        index.glob('*.json')
+        index.files()
+    assert walk.call_count == 1
@@ -1,6 +1,9 @@
+import os
+import sys
+
 import pytest
 
-from formica import helper
+from formica import aws, helper
 
 
 def test_with_artifacts(mocker, temp_bucket):
@@ -31,3 +34,32 @@ def test_with_artifacts_with_empty_artifacts(mocker):
     func(n)
     t.assert_not_called()
     function.assert_called_with(n)
+
+
+def test_aws_regions_from_endpoint_data(aws_client, mocker):
+    mocker.patch('boto3.DEFAULT_SESSION', None)
+    mocker.patch.dict('os.environ', {'AWS_DEFAULT_REGION': 'cn-north-1'})
+    aws.configure(regions_from='endpoints')
+    regions = helper.aws_regions()['AWSRegions']
+    assert 'cn-north-1' in regions
+    assert 'us-east-1' not in regions
+    aws_client.describe_regions.assert_not_called()
+
+    aws.configure(regions_from='endpoints', regions_partition='aws')
+    assert 'us-east-1' in helper.aws_regions()['AWSRegions']
+
+
+def test_aws_regions_from_endpoint_data_only_opted_in(aws_client, mocker):
+    aws_client.describe_regions.return_value = {'Regions': [{'RegionName': 'us-east-1'}]}
+    aws.configure(regions_from='endpoints', regions_partition='aws', only_opted_in_regions=True)
+    assert helper.aws_regions() == {'AWSRegions': ['us-east-1']}
+
+
+def test_config_directory_restores_working_directory(tmpdir):
+    cwd = os.getcwd()
+    tmpdir.mkdir('stack')
+    with pytest.raises(SystemExit):
+        with helper.config_directory(str(tmpdir.join('stack', 'stack.config.yaml'))):
+            assert os.getcwd() == str(tmpdir.join('stack'))
+            sys.exit(1)
+    assert os.getcwd() == cwd
@@ -0,0 +1,56 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ['boto3', 'botocore', 'deepdiff', 'jinja2', 'arrow', 'yaml']
+
+# Modules each command imports before talking to AWS, the modules it must not import and a generous import budget
+COMMANDS = {
+    'template': (['formica.cli', 'formica.loader'], ['boto3', 'botocore', 'deepdiff'], 1.0),
+    'affected': (['formica.cli', 'formica.affected'], ['boto3', 'botocore', 'deepdiff'], 1.0),
+    'stacks': (['formica.cli', 'texttable'], ['deepdiff', 'jinja2', 'arrow', 'yaml'], 0.5),
+    'describe': (['formica.cli', 'formica.change_set'], ['deepdiff', 'jinja2', 'arrow', 'yaml'], 1.5),
+    'deploy': (['formica.cli', 'formica.helper', 'formica.stack_waiter'], ['deepdiff', 'jinja2', 'arrow'], 1.5),
+    'stack-set remove': (['formica.cli', 'formica.stack_set'], ['deepdiff'], 2.0),
+}
+
+SCRIPT = '''
+import importlib, json, sys, time
+start = time.perf_counter()
+for module in sys.argv[1:]:
+    importlib.import_module(module)
+print(json.dumps({"duration": time.perf_counter() - start, "modules": sorted(sys.modules)}))
+'''
+
+
+def import_modules(modules):
+    result = subprocess.run([sys.executable, '-c', SCRIPT] + modules, stdout=subprocess.PIPE, check=True)
+    return json.loads(result.stdout.decode())
+
+
+@pytest.mark.parametrize('command', sorted(COMMANDS))
+def test_command_import_budget(command):
+    modules, forbidden, budget = COMMANDS[command]
+    result = import_modules(modules)
+    loaded = {module.split('.')[0] for module in result['modules']}
+    assert not loaded & set(forbidden)
+    assert result['duration'] < budget
+
+
+def test_cli_imports_no_heavy_modules():
+    result = import_modules(['formica.cli'])
+    assert not {module.split('.')[0] for module in result['modules']} & set(HEAVY_MODULES)
+
+
+def test_modules_do_not_create_clients_on_import():
+    script = (
+        'import boto3\n'
+        'def client(*args, **kwargs):\n'
+        '    raise AssertionError("client created on import")\n'
+        'boto3.client = client\n'
+        'import formica.change_set, formica.stack_waiter, formica.stack_set, formica.diff, formica.s3'
+    )
+    result = subprocess.run([sys.executable, '-c', script], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    assert result.returncode == 0, result.stdout.decode()
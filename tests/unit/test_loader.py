@@ -5,6 +5,9 @@ import pytest
 import yaml
 from path import Path
 
+from jinja2 import Environment
+
+from formica import cache, cli, file_index, pool
 from formica.loader import Loader
 from datetime import datetime, timedelta, timezone
 
@@ -573,3 +576,285 @@ def test_files_with_filter(load, tmpdir):
         load.load()
         all = json.loads(load.template())
     assert all == {"Resources": {"Test": 'moduledir1/test1.template.json,moduledir2/test2.template.json'}}
+
+
+def test_bytecode_cache_skips_compilation_on_warm_run(tmpdir, cache_directory, mocker):
+    cache.initialize()
+    example = '{"Description": "{{ \'test\' | title }}"}'
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write(example)
+        cold = Loader()
+        cold.load()
+        compile = mocker.spy(Environment, 'compile')
+        warm = Loader()
+        warm.load()
+    compile.assert_not_called()
+    assert cold.template() == warm.template()
+    assert os.listdir(os.path.join(cache_directory, 'bytecode'))
+
+
+def test_bytecode_cache_recompiles_changed_templates(tmpdir, mocker):
+    cache.initialize()
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "first"}')
+        Loader().load()
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "second"}')
+        compile = mocker.spy(Environment, 'compile')
+        load = Loader()
+        load.load()
+    compile.assert_called()
+    assert json.loads(load.template()) == {"Description": "second"}
+
+
+def test_bytecode_cache_evicts_above_max_size(tmpdir, cache_directory):
+    cache.initialize(cache_max_size=1)
+    bytecode = os.path.join(cache_directory, 'bytecode')
+    os.makedirs(bytecode)
+    with open(os.path.join(bytecode, 'old.bytecode'), 'wb') as f:
+        f.write(b'0' * 1024 * 1024)
+    os.utime(os.path.join(bytecode, 'old.bytecode'), (0, 0))
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "test"}')
+        Loader().load()
+        assert os.path.exists(os.path.join(bytecode, 'old.bytecode'))
+        cli.main(['template', '--cache-max-size', '1'])
+    assert not os.path.exists(os.path.join(bytecode, 'old.bytecode'))
+    assert os.listdir(bytecode)
+
+
+def test_eviction_keeps_files_outside_of_namespaces(cache_directory):
+    cache.initialize(cache_max_size=1)
+    with open(os.path.join(cache_directory, 'formica.sock'), 'wb') as f:
+        f.write(b'0' * 2 * 1024 * 1024)
+    os.utime(os.path.join(cache_directory, 'formica.sock'), (0, 0))
+    cache.store('templates', 'key', b'0' * 2 * 1024 * 1024)
+    cache.evict()
+    assert os.path.exists(os.path.join(cache_directory, 'formica.sock'))
+    assert not os.path.exists(os.path.join(cache_directory, 'templates', 'key'))
+
+
+def test_bytecode_cache_disabled_with_zero_size(tmpdir):
+    cache.initialize(cache_max_size=0)
+    with Path(tmpdir):
+        assert Loader().env.bytecode_cache is None
+
+
+def test_result_cache_skips_rendering_on_warm_run(tmpdir, mocker):
+    cache.initialize()
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        with open('moduledir/test.template.json', 'w') as f:
+            f.write('{"Description": "{{ code(\'../code.py\') }}"}')
+        with open('code.py', 'w') as f:
+            f.write('{{ test }}')
+        with open('test.template.json', 'w') as f:
+            f.write('{"Resources": {"TestResource": {"From": "Moduledir"}}}')
+        cold = Loader(variables={'test': 'value'})
+        cold.load()
+        render = mocker.spy(Loader, 'render')
+        warm = Loader(variables={'test': 'value'})
+        warm.load()
+    render.assert_not_called()
+    assert warm.template() == cold.template()
+    assert json.loads(warm.template()) == {"Description": "value"}
+    assert warm.dependencies == {'test.template.json', 'moduledir/test.template.json', 'code.py'}
+
+
+def test_result_cache_rerenders_for_changed_dependency(tmpdir):
+    cache.initialize()
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ code(\'code.py\') }}"}')
+        with open('code.py', 'w') as f:
+            f.write('first')
+        Loader().load()
+        with open('code.py', 'w') as f:
+            f.write('second')
+        load = Loader()
+        load.load()
+    assert json.loads(load.template()) == {"Description": "second"}
+
+
+def test_result_cache_rerenders_for_changed_variables(tmpdir):
+    cache.initialize()
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ test }}"}')
+        Loader(variables={'test': 'first'}).load()
+        load = Loader(variables={'test': 'second'})
+        load.load()
+    assert json.loads(load.template()) == {"Description": "second"}
+
+
+def test_result_cache_rerenders_for_new_template_file(tmpdir):
+    cache.initialize()
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "test"}')
+        Loader().load()
+        with open('other.template.json', 'w') as f:
+            f.write('{"Metadata": {"key": "value"}}')
+        load = Loader()
+        load.load()
+    assert json.loads(load.template()) == {"Description": "test", "Metadata": {"key": "value"}}
+
+
+def test_result_cache_ignores_time_dependent_templates(tmpdir, mocker):
+    cache.initialize()
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ now().timestamp }}"}')
+        Loader().load()
+        render = mocker.spy(Loader, 'render')
+        Loader().load()
+    render.assert_called()
+
+
+def write_module_project():
+    os.mkdir('moduledir')
+    with open('moduledir/bucket.template.yml', 'w') as f:
+        f.write('Resources:\n  {{ module_name }}Bucket:\n    Type: AWS::S3::Bucket\n'
+                '    Properties:\n      BucketName: !Sub "${AWS::StackName}-{{ Name }}"\n')
+    with open('moduledir/output.template.yml', 'w') as f:
+        f.write('Outputs:\n  {{ module_name }}Output:\n    Value: !Ref {{ module_name }}Bucket\n')
+    for index in range(4):
+        with open('test{}.template.yml'.format(index), 'w') as f:
+            f.write('Resources:\n' + ''.join(
+                '  Module{0}{1}:\n    From: Moduledir\n    Properties:\n      Name: name{0}{1}\n'
+                '  Plain{0}{1}:\n    Type: AWS::SNS::Topic\n'.format(index, module) for module in range(3)))
+
+
+def test_parallel_rendering_matches_serial_rendering(tmpdir, mocker):
+    with Path(tmpdir):
+        write_module_project()
+        serial = Loader()
+        serial.load()
+        pool.initialize(2)
+        submit = mocker.spy(pool.executor(), 'submit')
+        try:
+            parallel = Loader()
+            parallel.load()
+        finally:
+            pool.initialize()
+    assert submit.call_count == 4 + 4 * 3 * 2
+    assert parallel.template() == serial.template()
+    assert list(parallel.template_dictionary()['Resources']) == list(serial.template_dictionary()['Resources'])
+    assert parallel.dependencies == serial.dependencies
+    assert parallel.directories == serial.directories
+
+
+def test_files_records_listed_tree(tmpdir):
+    with Path(tmpdir):
+        os.makedirs('lambda/nested')
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ files(\'lambda/*\') | join(\',\') }}"}')
+        load = Loader()
+        load.load()
+    assert load.trees == {'.'}
+    assert load.directories == {'.', 'lambda', 'lambda/nested'}
+
+
+def test_parallel_rendering_exits_on_template_errors(tmpdir):
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ test | mandatory }}"}')
+        pool.initialize(2)
+        try:
+            with pytest.raises(SystemExit):
+                Loader().load()
+        finally:
+            pool.initialize()
+
+
+def test_identical_module_instances_are_rendered_once(tmpdir, mocker):
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        with open('moduledir/test.template.json', 'w') as f:
+            f.write('{"Resources": {"{{ Name }}Topic": {"Type": "AWS::SNS::Topic"}}}')
+        with open('first.template.json', 'w') as f:
+            f.write('{"Resources": {"First": {"From": "Moduledir", "Properties": {"Name": "A"}}}}')
+        with open('second.template.json', 'w') as f:
+            f.write('{"Resources": {"Second": {"From": "Moduledir", "Properties": {"Name": "A"}}, '
+                    '"Other": {"From": "Moduledir", "Properties": {"Name": "B"}}}}')
+        render = mocker.spy(Loader, 'render')
+        load = Loader()
+        load.load()
+    rendered = [call[0][1] for call in render.call_args_list]
+    # First and Second only differ in module_name, which the module doesn't use
+    assert rendered.count('test.template.json') == 2
+    assert json.loads(load.template()) == {
+        'Resources': {'ATopic': {'Type': 'AWS::SNS::Topic'}, 'BTopic': {'Type': 'AWS::SNS::Topic'}}}
+    assert load.dependencies == {'first.template.json', 'second.template.json', 'moduledir/test.template.json'}
+
+
+def test_modules_are_rendered_per_instance_when_included_files_use_module_name(tmpdir, mocker):
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        with open('moduledir/test.template.json', 'w') as f:
+            f.write('{"Resources": {{ file("name.txt") }}}')
+        with open('moduledir/name.txt', 'w') as f:
+            f.write('{"{{ module_name }}": {"Type": "AWS::SNS::Topic"}}')
+        with open('stack.template.json', 'w') as f:
+            f.write('{"Resources": {"First": {"From": "Moduledir"}, "Second": {"From": "Moduledir"}}}')
+        render = mocker.spy(Loader, 'render')
+        load = Loader()
+        load.load()
+    rendered = [call[0][1] for call in render.call_args_list]
+    assert rendered.count('test.template.json') == 2
+    assert sorted(load.template_dictionary()['Resources']) == ['First', 'Second']
+
+
+def test_memoized_modules_are_copied(tmpdir):
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        with open('moduledir/test.template.json', 'w') as f:
+            f.write('{"Resources": {"Topic": {"Type": "AWS::SNS::Topic"}}}')
+        with open('test.template.json', 'w') as f:
+            f.write('{"Resources": {"Topic": {"From": "Moduledir"}}}')
+        first = Loader()
+        first.load()
+        first.template_dictionary()['Resources']['Topic']['Type'] = 'Changed'
+        second = Loader(modules=first.modules)
+        second.load()
+    assert second.template_dictionary() == {'Resources': {'Topic': {'Type': 'AWS::SNS::Topic'}}}
+
+
+def test_directories_are_listed_once_per_run(tmpdir, mocker):
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        with open('moduledir/test.template.json', 'w') as f:
+            f.write('{"Resources": {"{{ module_name }}": {"Type": "AWS::SNS::Topic"}}}')
+        with open('test.template.json', 'w') as f:
+            f.write(json.dumps({'Resources': {'A': {'From': 'Moduledir'}, 'B': {'From': 'Moduledir::Test'}}}))
+        scandir = mocker.spy(os, 'scandir')
+        listdir = mocker.spy(os, 'listdir')
+        load = Loader()
+        load.load()
+    assert sorted(call[0][0] for call in scandir.call_args_list) == ['.', 'moduledir']
+    listdir.assert_not_called()
+    assert json.loads(load.template()) == {
+        'Resources': {'A': {'Type': 'AWS::SNS::Topic'}, 'B': {'Type': 'AWS::SNS::Topic'}}}
+
+
+def test_files_honours_ignore_patterns(tmpdir):
+    file_index.initialize(['moduledir2'])
+    example = '{"Resources": {"Test": "{{ files("moduledir*/*") | join(",")}}"}}'
+    try:
+        with Path(tmpdir):
+            with open('test.template.json', 'w') as f:
+                f.write(example)
+            os.mkdir('moduledir1')
+            with open('moduledir1/test1.template.json', 'w') as f:
+                f.write('')
+            os.mkdir('moduledir2')
+            with open('moduledir2/test2.template.json', 'w') as f:
+                f.write('')
+            load = Loader()
+            load.load()
+    finally:
+        file_index.initialize()
+    assert json.loads(load.template()) == {"Resources": {"Test": 'moduledir1/test1.template.json'}}
@@ -0,0 +1,19 @@
+import logging
+
+import formica
+from formica import output
+
+
+def test_prefix_formatter_prefixes_every_line():
+    record = logging.LogRecord('formica', logging.INFO, '', 0, 'one\ntwo', None, None)
+    formatter = output.PrefixFormatter('%(message)s')
+    with output.prefixed('stack'):
+        assert formatter.format(record) == '[stack] one\n[stack] two'
+    assert formatter.format(record) == 'one\ntwo'
+
+
+def test_prefixed_output_restores_formatter():
+    formatter = formica.handler.formatter
+    with output.prefixed_output():
+        assert isinstance(formica.handler.formatter, output.PrefixFormatter)
+    assert formica.handler.formatter is formatter
@@ -0,0 +1,71 @@
+import logging
+
+import pytest
+
+from formica import polling
+from formica.polling import Poller, BACKOFF, JITTER
+
+
+@pytest.fixture
+def monotonic(mocker):
+    return mocker.patch('formica.polling.monotonic', return_value=100)
+
+
+def delays(sleep):
+    return [call[0][0] for call in sleep.call_args_list]
+
+
+def test_backs_off_exponentially_up_to_maximum(sleep, mocker):
+    mocker.patch('formica.polling.random.uniform', return_value=1)
+    poller = Poller('test', 2, 5)
+    for _ in range(4):
+        poller.sleep()
+    assert delays(sleep) == [2, 2 * BACKOFF, 2 * BACKOFF * BACKOFF, 5]
+    assert poller.polls == 4
+
+
+def test_jitter_stays_within_bounds(sleep):
+    poller = Poller('test', 10, 10)
+    for _ in range(50):
+        poller.sleep()
+    assert all(10 * (1 - JITTER) <= delay <= 10 * (1 + JITTER) for delay in delays(sleep))
+
+
+def test_reset_returns_to_initial_delay(sleep, mocker):
+    mocker.patch('formica.polling.random.uniform', return_value=1)
+    poller = Poller('test', 1, 30)
+    poller.sleep()
+    poller.sleep()
+    poller.reset()
+    poller.sleep()
+    assert delays(sleep) == [1, BACKOFF, 1]
+
+
+def test_expires_after_timeout(monotonic):
+    poller = Poller('test', 1, 1, timeout=60)
+    monotonic.return_value = 160
+    assert not poller.expired()
+    monotonic.return_value = 161
+    assert poller.expired()
+    assert not Poller('test', 1, 1).expired()
+
+
+def test_finish_logs_timing_at_debug_level(monotonic, caplog, sleep):
+    poller = Poller('change set', 1, 1)
+    poller.sleep()
+    monotonic.return_value = 103.5
+    with caplog.at_level(logging.DEBUG, logger='formica.polling'):
+        poller.finish('CREATE_COMPLETE')
+    assert caplog.records[-1].levelno == logging.DEBUG
+    assert caplog.records[-1].message == 'Waited 3.5s for change set to finish with CREATE_COMPLETE after 1 polls'
+
+
+def test_configured_delays_override_defaults_including_zero(sleep):
+    polling.configure(delay=0, maximum=3)
+    poller = Poller('test', 5, 30)
+    assert poller.initial == 0
+    assert poller.maximum == 3
+    poller.sleep()
+    poller.sleep()
+    assert delays(sleep)[0] == 0
+    assert delays(sleep)[1] >= 1 - JITTER
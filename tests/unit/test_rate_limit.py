@@ -0,0 +1,95 @@
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from formica import aws, cli, rate_limit
+from formica.rate_limit import TokenBucket
+
+
+@pytest.fixture
+def monotonic(mocker):
+    return mocker.patch('formica.rate_limit.monotonic', return_value=100)
+
+
+@pytest.fixture
+def sleep(mocker):
+    return mocker.patch('formica.rate_limit.time').sleep
+
+
+def test_operations_are_grouped_in_families():
+    assert rate_limit.family('DescribeStackEvents') == 'describe'
+    assert rate_limit.family('GetTemplate') == 'describe'
+    assert rate_limit.family('ListStackSetOperationResults') == 'list'
+    assert rate_limit.family('CreateChangeSet') == 'change'
+
+
+def test_bucket_allows_burst_then_waits_for_refill(monotonic, sleep):
+    bucket = TokenBucket(rate=2, capacity=2)
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0.5
+    # Waiting callers reserve tokens in order
+    assert bucket.acquire() == 1
+    sleep.assert_called_with(1)
+    monotonic.return_value = 110
+    assert bucket.acquire() == 0
+
+
+def test_buckets_are_shared_per_account_region_and_family(monotonic, sleep):
+    rate_limit.configure({'describe': 1})
+    assert rate_limit.acquire('1', 'us-east-1', 'DescribeStacks') == 0
+    assert rate_limit.acquire('1', 'us-east-1', 'DescribeStackEvents') == 0
+    assert rate_limit.acquire('1', 'us-east-1', 'DescribeStacks') == 1
+    assert rate_limit.acquire('1', 'eu-west-1', 'DescribeStacks') == 0
+    assert rate_limit.acquire('2', 'us-east-1', 'DescribeStacks') == 0
+    assert rate_limit.acquire('1', 'us-east-1', 'ListStacks') == 0
+
+
+def test_rate_of_zero_turns_limit_off(monotonic, sleep):
+    rate_limit.configure({'change': 0})
+    assert not rate_limit.limited('UpdateStack')
+    for _ in range(10):
+        assert rate_limit.acquire('1', 'us-east-1', 'UpdateStack') == 0
+    sleep.assert_not_called()
+
+
+def test_configure_rejects_unknown_family():
+    with pytest.raises(ValueError):
+        rate_limit.configure({'unknown': 1})
+
+
+def test_cloudformation_clients_call_through_rate_limit(mocker):
+    acquire = mocker.patch('formica.rate_limit.acquire')
+    mocker.patch('formica.aws.caller_identity', return_value={'Account': '1234'})
+    session = boto3.session.Session(
+        region_name='eu-central-1', aws_access_key_id='key', aws_secret_access_key='secret')
+    mocker.patch('boto3.client', session.client)
+    client = aws.client('cloudformation')
+    assert client.meta.config.retries['mode'] == 'adaptive'
+    with Stubber(client) as stubber:
+        stubber.add_response('describe_stacks', {'Stacks': []})
+        client.describe_stacks()
+    acquire.assert_called_once_with('1234', 'eu-central-1', 'DescribeStacks')
+
+
+def test_configured_retry_mode_replaces_adaptive_retries(mocker):
+    session = boto3.session.Session(
+        region_name='eu-central-1', aws_access_key_id='key', aws_secret_access_key='secret')
+    mocker.patch('boto3.client', session.client)
+    aws.configure(retry_mode='standard')
+    assert aws.client('cloudformation').meta.config.retries['mode'] == 'standard'
+
+
+def test_rate_limits_are_passed_to_aws(mocker):
+    initialize = mocker.patch('formica.aws.initialize')
+    mocker.patch('formica.cli.execute')
+    cli.main(['stacks', '--rate-limits', 'describe=10', 'change=0.5'])
+    assert initialize.call_args[1]['rate_limits'] == {'describe': 10, 'change': 0.5}
+
+
+def test_unknown_rate_limit_family_exits(mocker):
+    mocker.patch('formica.aws.initialize')
+    logger = mocker.patch('formica.cli.logger')
+    with pytest.raises(SystemExit):
+        cli.main(['stacks', '--rate-limits', 'deploy=1'])
+    logger.error.assert_called_with('Rate limit deploy needs to be one of describe, list, change')
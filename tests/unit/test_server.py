@@ -0,0 +1,80 @@
+import io
+import os
+import socket
+import tempfile
+import threading
+
+from path import Path
+
+from formica import cache, cli, server
+
+
+def run_with_server(argv, stdin=''):
+    server_connection, client_connection = socket.socketpair()
+    stdout, stderr = io.BytesIO(), io.BytesIO()
+    result = {}
+
+    def run_client():
+        with client_connection:
+            result['code'] = server.client(client_connection, argv, io.StringIO(stdin), stdout, stderr)
+
+    thread = threading.Thread(target=run_client)
+    thread.start()
+    with server_connection:
+        server.handle(server_connection)
+    thread.join()
+    return result['code'], stdout.getvalue().decode(), stderr.getvalue().decode()
+
+
+def test_server_runs_command_in_client_directory(tmpdir):
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ Name }}"}')
+        code, stdout, _ = run_with_server(['template', '--vars', 'Name=served'])
+    assert code == 0
+    assert '"Description": "served"' in stdout
+
+
+def test_server_returns_exit_code_and_errors(tmpdir):
+    with Path(tmpdir):
+        code, _, stderr = run_with_server(['template', '--vars'])
+    assert code == 2
+    assert 'expected at least one argument' in stderr
+
+
+def test_server_reads_stdin_of_client(tmpdir):
+    with Path(tmpdir):
+        with open('stack.config.yaml', 'w') as f:
+            f.write('stack: served')
+        with open('stack.template.json', 'w') as f:
+            f.write('{"Description": "served"}')
+        code, stdout, _ = run_with_server(['affected', '--stacks', 'stack.config.yaml'], stdin='stack.config.yaml\n')
+    assert code == 0
+    assert stdout == 'served\n'
+
+
+def test_forward_without_server_runs_locally(tmpdir):
+    assert server.forward(['template'], path=str(tmpdir.join('formica.sock'))) is None
+
+
+def test_formica_runs_locally_without_server(mocker, tmpdir):
+    mocker.patch.dict('os.environ', {server.SOCKET_VARIABLE: str(tmpdir.join('formica.sock'))})
+    mocker.patch('sys.argv', ['formica', 'stacks'])
+    main = mocker.patch('formica.cli.main')
+    cli.formica()
+    main.assert_called_with(['stacks'])
+
+
+def test_default_socket_is_outside_of_cache(mocker, tmpdir):
+    mocker.patch.dict('os.environ', {'XDG_RUNTIME_DIR': str(tmpdir)})
+    assert server.socket_path() == str(tmpdir.join('formica', 'formica.sock'))
+    mocker.patch.dict('os.environ', {'XDG_RUNTIME_DIR': ''})
+    assert server.socket_path().startswith(os.path.join(tempfile.gettempdir(), 'formica-'))
+    assert not server.socket_path().startswith(cache.DEFAULT_DIRECTORY)
+
+
+def test_forward_ignores_sockets_of_other_users(mocker, tmpdir):
+    path = tmpdir.join('formica.sock')
+    path.write('')
+    mocker.patch('os.getuid', return_value=os.stat(str(path)).st_uid + 1)
+    assert server.forward_connection(str(path)) is None
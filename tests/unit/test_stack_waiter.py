@@ -2,13 +2,15 @@ import pytest
 from mock import Mock
 from datetime import datetime, timedelta
 
-from formica.stack_waiter import StackWaiter, EVENT_TABLE_HEADERS
+from formica import cli
+from formica.polling import JITTER
+from formica.stack_waiter import MultiStackWaiter, StackWaiter, EVENT_TABLE_HEADERS, POLL_DELAY
 from tests.unit.constants import STACK, STACK_EVENTS
 
 
 @pytest.fixture
 def time(mocker):
-    return mocker.patch('formica.stack_waiter.time')
+    return mocker.patch('formica.polling.time')
 
 
 @pytest.fixture
@@ -27,8 +29,7 @@ def stack_waiter():
 
 @pytest.fixture
 def client(mocker):
-    client = mocker.patch('formica.stack_waiter.cf')
-    return client
+    return mocker.patch('boto3.client').return_value
 
 def set_stack_status_returns(client, statuses):
     client.describe_stacks.side_effect = [{'Stacks': [{'StackStatus': status}]} for status in
@@ -53,7 +54,7 @@ def test_waits_until_successful(client, time, stack_waiter):
     set_stack_events(client)
     stack_waiter.wait('0')
     assert time.sleep.call_count == 1
-    time.sleep.assert_called_with(5)
+    assert POLL_DELAY * (1 - JITTER) <= time.sleep.call_args[0][0] <= POLL_DELAY * (1 + JITTER)
 
 
 def test_waits_until_failed_and_raises(client, time, stack_waiter):
@@ -100,3 +101,79 @@ def test_prints_new_events(logger, time, client, stack_waiter):
     for term in old_events:
         assert term not in output
     assert 'None' not in output
+
+
+def test_reads_event_pages_until_last_seen_event(logger, time, client, stack_waiter):
+    set_stack_status_returns(client, ['UPDATE_IN_PROGRESS', 'UPDATE_COMPLETE'])
+    client.describe_stack_events.side_effect = [
+        {'StackEvents': [{'EventId': '4'}, {'EventId': '3'}], 'NextToken': 'older'},
+        {'StackEvents': [{'EventId': '2'}, {'EventId': '1'}], 'NextToken': 'oldest'},
+        {'StackEvents': [{'EventId': '5'}, {'EventId': '4'}], 'NextToken': 'newer'},
+    ]
+    printed = []
+    stack_waiter.print_header = lambda: None
+    stack_waiter.print_events = lambda events: printed.append([e['EventId'] for e in events])
+    stack_waiter.wait('2')
+
+    assert printed == [['4', '3'], ['5']]
+    assert client.describe_stack_events.call_args_list[1][1] == {'StackName': STACK, 'NextToken': 'older'}
+    # Pages behind the last seen event are never requested
+    assert client.describe_stack_events.call_count == 3
+
+
+def described(name, status, updated=None):
+    return {'StackId': 'id-' + name, 'StackName': name, 'StackStatus': status, 'LastUpdatedTime': updated}
+
+
+@pytest.fixture
+def multi_stack_client(client):
+    client.describe_stacks.side_effect = lambda StackName: {'Stacks': [described(StackName, 'UPDATE_IN_PROGRESS', 1)]}
+    client.describe_stack_events.return_value = {'StackEvents': [{'EventId': 'start'}]}
+    return client
+
+
+def test_multi_stack_waiter_reads_events_of_changed_stacks(multi_stack_client, time, logger):
+    client = multi_stack_client
+    pages = [
+        [{'Stacks': [described('first', 'UPDATE_IN_PROGRESS', 1), described('second', 'UPDATE_IN_PROGRESS', 1)]}],
+        [{'Stacks': [described('first', 'UPDATE_COMPLETE', 2), described('second', 'UPDATE_COMPLETE', 2)]}],
+    ]
+    client.get_paginator.return_value.paginate.side_effect = pages
+    waiter = MultiStackWaiter(['first', 'second'])
+    client.describe_stack_events.reset_mock()
+    waiter.wait()
+
+    # Nothing changed on the first poll, events are only read once both stacks finished
+    assert time.sleep.call_count == 1
+    assert [call[1]['StackName'] for call in client.describe_stack_events.call_args_list] == ['id-first', 'id-second']
+    client.get_paginator.assert_called_with('describe_stacks')
+
+
+def test_multi_stack_waiter_stops_paging_once_all_stacks_are_found(multi_stack_client, time, logger):
+    client = multi_stack_client
+    client.get_paginator.return_value.paginate.return_value = iter([
+        {'Stacks': [described('first', 'CREATE_COMPLETE', 2)]},
+        {'Stacks': [described('other', 'CREATE_COMPLETE')]},
+    ])
+    MultiStackWaiter(['first']).wait()
+    time.sleep.assert_not_called()
+    assert next(client.get_paginator.return_value.paginate.return_value)['Stacks'][0]['StackName'] == 'other'
+
+
+def test_multi_stack_waiter_describes_deleted_stacks_and_fails(multi_stack_client, time, logger):
+    client = multi_stack_client
+    client.get_paginator.return_value.paginate.return_value = [{'Stacks': []}]
+    waiter = MultiStackWaiter(['gone', 'failed'])
+    client.describe_stacks.side_effect = lambda StackName: {'Stacks': [
+        described('gone', 'DELETE_COMPLETE', 2) if StackName == 'id-gone' else described('failed', 'DELETE_FAILED', 2)
+    ]}
+    with pytest.raises(SystemExit):
+        waiter.wait()
+    logger.info.assert_called_with('Stacks failed: failed')
+
+
+def test_wait_for_several_stacks(mocker, client):
+    waiter = mocker.patch('formica.stack_waiter.MultiStackWaiter')
+    cli.main(['wait', '--stacks', 'first', 'second'])
+    waiter.assert_called_with(['first', 'second'])
+    waiter.return_value.wait.assert_called_once()
@@ -0,0 +1,84 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from formica import cli, teardown
+
+
+@pytest.fixture
+def stacks(client, paginators):
+    """Stacks network and app, app imports the VPC exported by network"""
+    status = {'network': 'CREATE_COMPLETE', 'app': 'CREATE_COMPLETE', 'other': 'CREATE_COMPLETE'}
+    deleted = []
+
+    def describe_stacks(StackName):
+        name = StackName.replace('id-', '')
+        if name not in status:
+            raise ClientError(
+                {'Error': {'Code': 'ValidationError', 'Message': 'Stack with id {} does not exist'.format(name)}},
+                'DescribeStacks',
+            )
+        return {'Stacks': [{'StackId': 'id-' + name, 'StackStatus': status[name]}]}
+
+    def delete_stack(StackName, **kwargs):
+        deleted.append(StackName)
+        status[StackName] = 'DELETE_COMPLETE'
+
+    client.describe_stacks.side_effect = describe_stacks
+    client.delete_stack.side_effect = delete_stack
+    client.get_paginator.side_effect = paginators(
+        list_exports=[{'Exports': [{'ExportingStackId': 'id-network', 'Name': 'network-Vpc'}]}],
+        list_imports=[{'Imports': ['app']}],
+    )
+    return status, deleted
+
+
+def test_remove_stacks_deletes_importers_first(stacks, client):
+    status, deleted = stacks
+    cli.main(['remove', '--stacks', 'network', 'app', 'other'])
+    assert deleted.index('app') < deleted.index('network')
+    assert sorted(deleted) == ['app', 'network', 'other']
+
+
+def test_remove_stacks_deletes_independent_stacks_together(stacks, client, sleep):
+    status, deleted = stacks
+    cli.main(['remove', '--stacks', 'network', 'app', 'other'])
+    # app and other are deleted in the first round, network once app is gone
+    assert deleted[:2] == ['app', 'other']
+    assert sleep.call_count == 2
+
+
+def test_remove_stacks_skips_exporters_of_failed_stacks(stacks, client, caplog):
+    status, deleted = stacks
+
+    def delete_stack(StackName, **kwargs):
+        deleted.append(StackName)
+        status[StackName] = 'DELETE_FAILED' if StackName == 'app' else 'DELETE_COMPLETE'
+
+    client.delete_stack.side_effect = delete_stack
+    with pytest.raises(SystemExit) as e:
+        cli.main(['remove', '--stacks', 'network', 'app'])
+    assert e.value.code == 1
+    assert deleted == ['app']
+    assert 'app was not removed' in caplog.text
+    assert 'Stacks stuck in DELETE_FAILED: app' in caplog.text
+
+
+def test_remove_stacks_keeps_stacks_imported_from_outside(stacks, client, caplog):
+    status, deleted = stacks
+    with pytest.raises(SystemExit):
+        cli.main(['remove', '--stacks', 'network'])
+    assert deleted == []
+    assert 'Export network-Vpc is imported by app' in caplog.text
+
+
+def test_remove_stacks_ignores_missing_stacks(stacks, client):
+    status, deleted = stacks
+    cli.main(['remove', '--stacks', 'other', 'missing', '--role-arn', 'arn:aws:iam::123:role/remove'])
+    client.delete_stack.assert_called_once_with(StackName='other', RoleARN='arn:aws:iam::123:role/remove')
+
+
+def test_teardown_retries_stacks_that_failed_before(stacks, client):
+    status, deleted = stacks
+    status['app'] = 'DELETE_FAILED'
+    assert teardown.Teardown(['network', 'app']).remove() == []
+    assert deleted == ['app', 'network']
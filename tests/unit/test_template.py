@@ -1,5 +1,7 @@
 import json
 import os
+import subprocess
+import sys
 import yaml
 import pytest
 from path import Path
@@ -148,3 +150,41 @@ def test_with_artifacts(aws_client, tmpdir, logger, paginators):
         actual = yaml.safe_load(output)
         expected = {"Resources": {"Bucket": "formica-deploy-83acc03037c35fdce1aae77faa87d9f2", "Key": "864c71d530a42421476458005e05b2a0" }}
     assert actual == expected
+
+
+def test_template_watch_diff_calls_watch(tmpdir, mocker):
+    watch = mocker.patch('formica.watch.watch')
+    with Path(tmpdir):
+        cli.main(['template', '--watch-diff', '--vars', 'A=B'])
+        watch.assert_called_once()
+        assert watch.call_args[0][0] == {'A': 'B'}
+        assert watch.call_args[1] == {'diff': True}
+
+
+def test_template_does_not_initialize_aws(tmpdir, logger, mocker):
+    initialize = mocker.patch('formica.aws.initialize')
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "Test"}')
+        cli.main(['template', '--vars', 'role_name=Role'])
+    initialize.assert_not_called()
+
+
+def test_template_with_organization_variables_initializes_aws(aws_client, tmpdir, logger, mocker):
+    initialize = mocker.patch('formica.aws.initialize')
+    aws_client.describe_regions.return_value = EC2_REGIONS
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ AWSRegions | length }}"}')
+        cli.main(['template', '--organization-region-variables', '--region', 'eu-central-1'])
+    initialize.assert_called_once()
+    assert initialize.call_args[0] == ('eu-central-1', None)
+
+
+def test_template_does_not_import_botocore(tmpdir):
+    script = 'import sys; from formica import cli; cli.main(["template"]); assert "botocore" not in sys.modules'
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "Test"}')
+        result = subprocess.run([sys.executable, '-c', script], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    assert result.returncode == 0, result.stdout.decode()
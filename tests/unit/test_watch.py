@@ -0,0 +1,107 @@
+import json
+import os
+import sys
+
+import pytest
+from path import Path
+
+from formica import watch
+from formica.loader import Loader
+
+
+def write(name, content):
+    with open(name, 'w') as f:
+        f.write(content)
+
+
+@pytest.fixture
+def project(tmpdir):
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        write('moduledir/topic.template.json', '{"Resources": {"{{ module_name }}": {"Type": "{{ Type }}"}}}')
+        write('code.py', 'first')
+        write('first.template.json', '{"Description": "{{ code(\'code.py\') }}"}')
+        write('second.template.json', '{"Resources": {"Topic": {"From": "Moduledir", "Properties": {"Type": "A"}}}}')
+        yield tmpdir
+
+
+def full_render():
+    loader = Loader()
+    loader.load()
+    return loader.template()
+
+
+def test_renders_only_changed_files(project, mocker):
+    template_watcher = watch.TemplateWatcher()
+    template_watcher.render()
+    write('code.py', 'second')
+    parse = mocker.spy(Loader, 'parse_template')
+    loader = template_watcher.render({'code.py'})
+    assert [call[0][1] for call in parse.call_args_list] == ['first.template.json']
+    assert loader.template() == full_render()
+    assert json.loads(loader.template())['Description'] == 'second'
+
+
+def test_rerenders_files_using_changed_modules(project, mocker):
+    template_watcher = watch.TemplateWatcher()
+    template_watcher.render()
+    write('moduledir/topic.template.json', '{"Resources": {"{{ module_name }}": {"Type": "Changed{{ Type }}"}}}')
+    parse = mocker.spy(Loader, 'parse_template')
+    loader = template_watcher.render({'moduledir/topic.template.json'})
+    assert sorted(call[0][1] for call in parse.call_args_list) == ['second.template.json', 'topic.template.json']
+    assert json.loads(loader.template())['Resources'] == {'Topic': {'Type': 'ChangedA'}}
+
+
+def test_renders_new_template_files(project):
+    template_watcher = watch.TemplateWatcher()
+    template_watcher.render()
+    write('third.template.json', '{"Outputs": {"Out": {"Value": "value"}}}')
+    loader = template_watcher.render({'third.template.json'})
+    assert loader.template() == full_render()
+
+
+def test_watched_directories_skip_version_control_and_packages(project):
+    os.makedirs('.git/objects')
+    os.makedirs('node_modules/package')
+    write('.git/objects/object', '')
+    write('node_modules/package/index.js', '')
+    write('node_modules/package/used.json', '')
+    directories = watch.watched_directories({'node_modules/package/used.json'})
+    assert directories == ['.', 'moduledir', 'node_modules/package']
+
+
+def test_watch_prints_diff_after_change(project, mocker):
+    logger = mocker.patch('formica.watch.logger')
+    changes = mocker.Mock()
+
+    def changed():
+        write('code.py', 'second')
+        return {'code.py'}
+
+    def change():
+        if changes.changes.call_count == 1:
+            return changed()
+        raise KeyboardInterrupt()
+
+    changes.changes.side_effect = change
+    mocker.patch('formica.watch.watcher').return_value = changes
+    with pytest.raises(KeyboardInterrupt):
+        watch.watch({}, lambda loader: loader.template(), diff=True)
+    output = [call[0][0] for call in logger.info.call_args_list]
+    assert '-    "Description":"first",' in output[2]
+    assert '+    "Description":"second",' in output[2]
+    changes.close.assert_called()
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is only available on linux')
+def test_inotify_reports_changed_files(tmpdir):
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        inotify = watch.Inotify()
+        try:
+            inotify.update(['.', 'moduledir'])
+            write('moduledir/test.template.json', '{}')
+            write('code.py', '')
+            assert inotify.changes() == {'moduledir/test.template.json', 'code.py'}
+        finally:
+            inotify.close()
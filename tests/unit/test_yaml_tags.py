@@ -1,6 +1,8 @@
 import pytest
+import yaml
 from path import Path
 
+from formica import yaml_tags
 from formica.loader import Loader
 
 
@@ -21,7 +23,7 @@ def runner(loader, tmpdir):
     return validate
 
 
-@pytest.mark.parametrize('input,expected', [
+TAG_EXAMPLES = [
     ('Resources: !Base64 something', {'Resources': {"Fn::Base64": 'something'}}),
     ('Resources: !And [ !Equals ["a", "b"], !Equals ["c", "d"], ] ',
      {'Resources': {"Fn::And": [{"Fn::Equals": ['a', 'b']}, {"Fn::Equals": ['c', 'd']}]}}),
@@ -45,6 +47,24 @@ def runner(loader, tmpdir):
     ('Resources: !Condition TestCondition', {'Resources': {'Condition': 'TestCondition'}}),
     ('Resources: !Cidr [ "A", "B", "C" ]', {'Resources': {'Fn::Cidr': ["A", "B", "C"]}}),
 
-])
+]
+
+
+@pytest.mark.parametrize('input,expected', TAG_EXAMPLES)
 def test_yaml_tag(runner, input, expected):
     runner(input, expected)
+
+
+@pytest.mark.parametrize('input,expected', TAG_EXAMPLES)
+def test_python_loader_supports_yaml_tag(input, expected):
+    assert yaml_tags.load(input, loader=yaml_tags.PythonTemplateLoader) == expected
+
+
+@pytest.mark.skipif(not yaml.__with_libyaml__, reason='libyaml is not available')
+def test_template_loader_uses_libyaml():
+    assert issubclass(yaml_tags.TemplateLoader, yaml.CFullLoader)
+
+
+def test_tags_are_not_registered_on_safe_loaders():
+    with pytest.raises(yaml.YAMLError):
+        yaml.safe_load('Resources: !Ref ABC')